@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Benchmark fleet poll throughput against simulated Venus E batteries.
+
+The batteries are served by tools/venus_e_emulator.py, each on its own
+loopback address, so replies are routed by source address exactly like
+on a real network. All coordinators share one fleet endpoint and its
+poll slots, as in the integration, and every round refreshes them all at
+once, the worst case of their poll timers firing together.
+
+Usage:
+    python benchmarks/bench_fleet.py               # 10, 100 and 500 devices
+    python benchmarks/bench_fleet.py 50 200 --rounds 10
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from homeassistant.core import HomeAssistant  # noqa: E402
+
+from custom_components.marstek_venus_e3.const import POLL_COMMANDS  # noqa: E402
+from custom_components.marstek_venus_e3.coordinator import MarstekVenusE3Coordinator  # noqa: E402
+from custom_components.marstek_venus_e3.fleet import MarstekFleet  # noqa: E402
+from tools.venus_e_emulator import VenusEmulator  # noqa: E402
+
+DEFAULT_DEVICE_COUNTS = (10, 100, 500)
+
+
+async def run(device_count: int, rounds: int, port: int) -> dict:
+    """Poll device_count simulated batteries and return the results."""
+    hass = HomeAssistant(tempfile.mkdtemp())
+
+    emulator = VenusEmulator(device_count, port=port)
+    await emulator.async_start()
+
+    fleet = MarstekFleet()
+    for address in emulator.addresses:
+        coordinator = MarstekVenusE3Coordinator(
+            hass,
+            address,
+            port,
+            60,
+            transport=fleet.transport,
+            poll_slots=fleet.poll_slots,
+        )
+        await fleet.async_register(coordinator)
+
+    durations = []
+    failures = 0
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await asyncio.gather(*(c.async_refresh() for c in fleet.coordinators))
+            durations.append(time.perf_counter() - start)
+            failures += sum(not c.last_update_success for c in fleet.coordinators)
+    finally:
+        for coordinator in fleet.coordinators:
+            await fleet.async_unregister(coordinator)
+        emulator.close()
+
+    cycle = statistics.median(durations)
+    return {
+        "devices": device_count,
+        "cycle_ms": cycle * 1000,
+        "polls_per_s": device_count / cycle,
+        "requests_per_s": device_count * len(POLL_COMMANDS) / cycle,
+        "failures": failures,
+    }
+
+
+def main() -> int:
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("devices", nargs="*", type=int, default=DEFAULT_DEVICE_COUNTS)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--port", type=int, default=30000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"{'devices':>8} {'cycle (ms)':>11} {'polls/s':>9} {'requests/s':>11} {'failures':>9}")
+    for device_count in args.devices:
+        result = asyncio.run(run(device_count, args.rounds, args.port))
+        print(
+            f"{result['devices']:>8} {result['cycle_ms']:>11.1f} {result['polls_per_s']:>9.0f} "
+            f"{result['requests_per_s']:>11.0f} {result['failures']:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the Marstek Venus E 3.0 coordinator.
+
+Runs against tools/venus_e_emulator.py started in a subprocess, so the
+CPU time measured here is only the integration's own, and reports:
+
+- p50/p95/p99 latency of _async_update_data and async_set_mode
+- time spent in backoff sleeps under packet loss
+- wall time of async_setup_entry, and until the first poll (run in the
+  background) has delivered data
+- CPU time per poll
+
+Results are written to a JSON file so regressions can be tracked between
+releases.
+
+Usage:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --polls 200 --loss 0.1 --output bench_results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+from datetime import datetime, timezone
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from homeassistant import bootstrap, config_entries, loader  # noqa: E402
+from homeassistant.core import CoreState, HomeAssistant  # noqa: E402
+
+from custom_components.marstek_venus_e3.const import (  # noqa: E402
+    CONF_IP_ADDRESS,
+    CONF_PORT,
+    DOMAIN,
+)
+from custom_components.marstek_venus_e3.coordinator import MarstekVenusE3Coordinator  # noqa: E402
+
+EMULATOR = ROOT / "tools" / "venus_e_emulator.py"
+MANIFEST = ROOT / "custom_components" / DOMAIN / "manifest.json"
+
+CLEAN_ADDRESS = "127.0.1.1"
+LOSSY_ADDRESS = "127.0.2.1"
+
+
+class TimedBackoffCoordinator(MarstekVenusE3Coordinator):
+    """Coordinator recording the time spent in backoff sleeps."""
+
+    backoff_seconds = 0.0
+
+    async def _async_backoff(self, delay: float) -> None:
+        """Wait before the next attempt and record how long it took."""
+        start = time.perf_counter()
+        try:
+            await super()._async_backoff(delay)
+        finally:
+            self.backoff_seconds += time.perf_counter() - start
+
+
+@contextlib.asynccontextmanager
+async def emulator_process(address: str, port: int, *options: str):
+    """Run the emulator in a subprocess until the block exits."""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        str(EMULATOR),
+        "--base-address",
+        address,
+        "--port",
+        str(port),
+        *options,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        # The emulator prints one line per battery once it is listening
+        await process.stdout.readline()
+        yield address
+    finally:
+        process.terminate()
+        await process.wait()
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Return p50/p95/p99 and mean of samples in milliseconds."""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+async def async_create_hass() -> HomeAssistant:
+    """Return a minimal running Home Assistant with the integration available."""
+    config_dir = tempfile.mkdtemp()
+    os.symlink(ROOT / "custom_components", Path(config_dir) / "custom_components")
+
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await bootstrap.async_load_base_functionality(hass)
+    hass.set_state(CoreState.running)
+    return hass
+
+
+async def bench_poll(hass: HomeAssistant, address: str, port: int, polls: int) -> dict:
+    """Measure _async_update_data latency and CPU time per poll."""
+    coordinator = MarstekVenusE3Coordinator(hass, address, port, 60)
+    await coordinator.async_connect()
+    samples = []
+    try:
+        cpu_start = time.process_time()
+        for _ in range(polls):
+            start = time.perf_counter()
+            await coordinator._async_update_data()
+            samples.append(time.perf_counter() - start)
+        cpu = time.process_time() - cpu_start
+    finally:
+        await coordinator.async_disconnect()
+
+    return {**summarize(samples), "cpu_ms_per_poll": cpu / polls * 1000}
+
+
+async def bench_set_mode(hass: HomeAssistant, address: str, port: int, calls: int) -> dict:
+    """Measure async_set_mode latency."""
+    coordinator = MarstekVenusE3Coordinator(hass, address, port, 60)
+    await coordinator.async_connect()
+    samples = []
+    failures = 0
+    try:
+        for index in range(calls):
+            start = time.perf_counter()
+            success = await coordinator.async_set_mode(mode=3, power=100 * (index % 10), cd_time=300)
+            samples.append(time.perf_counter() - start)
+            failures += not success
+    finally:
+        await coordinator.async_disconnect()
+
+    return {**summarize(samples), "failures": failures}
+
+
+async def bench_loss(hass: HomeAssistant, address: str, port: int, polls: int, loss: float) -> dict:
+    """Measure poll latency and backoff time under packet loss."""
+    coordinator = TimedBackoffCoordinator(hass, address, port, 60)
+    await coordinator.async_connect()
+    samples = []
+    failures = 0
+    try:
+        for _ in range(polls):
+            start = time.perf_counter()
+            try:
+                await coordinator._async_update_data()
+            except Exception:  # pylint: disable=broad-except
+                failures += 1
+            samples.append(time.perf_counter() - start)
+    finally:
+        await coordinator.async_disconnect()
+
+    return {
+        **summarize(samples),
+        "loss": loss,
+        "failures": failures,
+        "backoff_s_total": coordinator.backoff_seconds,
+        "backoff_ms_per_poll": coordinator.backoff_seconds / polls * 1000,
+    }
+
+
+async def async_wait_update(coordinator: MarstekVenusE3Coordinator) -> None:
+    """Wait for the next update of a coordinator."""
+    updated = asyncio.get_running_loop().create_future()
+
+    def listener() -> None:
+        if not updated.done():
+            updated.set_result(None)
+
+    remove = coordinator.async_add_listener(listener)
+    try:
+        await updated
+    finally:
+        remove()
+
+
+async def bench_setup(hass: HomeAssistant, address: str, port: int, runs: int) -> tuple[dict, dict]:
+    """Measure async_setup_entry wall time, and the time until the first data."""
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"Marstek Venus E 3.0 ({address})",
+        data={CONF_IP_ADDRESS: address, CONF_PORT: port},
+        source=config_entries.SOURCE_USER,
+        options={},
+    )
+    samples = []
+    first_data = []
+
+    for run_index in range(runs):
+        start = time.perf_counter()
+        if run_index == 0:
+            await hass.config_entries.async_add(entry)
+        else:
+            await hass.config_entries.async_setup(entry.entry_id)
+        samples.append(time.perf_counter() - start)
+        # The first poll runs in the background
+        await async_wait_update(hass.data[DOMAIN][entry.entry_id])
+        first_data.append(time.perf_counter() - start)
+        await hass.config_entries.async_unload(entry.entry_id)
+
+    await hass.config_entries.async_remove(entry.entry_id)
+    return summarize(samples), summarize(first_data)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Run every benchmark and return the results."""
+    hass = await async_create_hass()
+    results = {}
+    try:
+        async with emulator_process(CLEAN_ADDRESS, args.port):
+            results["poll"] = await bench_poll(hass, CLEAN_ADDRESS, args.port, args.polls)
+            results["set_mode"] = await bench_set_mode(hass, CLEAN_ADDRESS, args.port, args.polls)
+            results["setup_entry"], results["first_data"] = await bench_setup(
+                hass, CLEAN_ADDRESS, args.port, args.setup_runs
+            )
+
+        async with emulator_process(LOSSY_ADDRESS, args.port, "--loss", str(args.loss), "--seed", str(args.seed)):
+            results["poll_under_loss"] = await bench_loss(hass, LOSSY_ADDRESS, args.port, args.loss_polls, args.loss)
+    finally:
+        await hass.async_stop(force=True)
+
+    return results
+
+
+def main() -> int:
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=100, help="polls and set_mode calls per benchmark")
+    parser.add_argument("--loss", type=float, default=0.1, help="packet loss ratio for the backoff benchmark")
+    parser.add_argument("--loss-polls", type=int, default=20, help="polls run under packet loss")
+    parser.add_argument("--setup-runs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=30000)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    with open(MANIFEST, "r", encoding="utf-8") as f:
+        version = json.load(f)["version"]
+
+    results = {
+        "version": version,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "parameters": vars(args),
+        "results": asyncio.run(run(args)),
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
+
+    for name, values in results["results"].items():
+        print(
+            f"{name:<16} p50={values['p50_ms']:8.1f} ms  p95={values['p95_ms']:8.1f} ms  "
+            f"p99={values['p99_ms']:8.1f} ms"
+        )
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
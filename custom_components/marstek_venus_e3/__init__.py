@@ -1,14 +1,50 @@
 """The Marstek Venus E 3.0 integration."""
+import asyncio
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform, CONF_SCAN_INTERVAL
-from homeassistant.core import HomeAssistant, ServiceCall
-from homeassistant.helpers import device_registry as dr
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.helpers import config_validation as cv, device_registry as dr
+from homeassistant.helpers.storage import Store
 import voluptuous as vol
 
-from .const import DOMAIN, CONF_IP_ADDRESS, CONF_PORT, DEFAULT_PORT, DEFAULT_SCAN_INTERVAL
+from .const import (
+    DOMAIN,
+    CONF_ADAPTIVE_POLLING,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_IP_ADDRESS,
+    CONF_MAX_RETRIES,
+    CONF_PORT,
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+    CONF_POWER_HEARTBEAT,
+    CONF_SRC,
+    CONF_TIMEOUT,
+    DATA_FLEET,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_PORT,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_POWER_DEADBAND_PERCENT,
+    DEFAULT_POWER_HEARTBEAT,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TIMEOUT,
+    DISPATCH_CD_TIME,
+    MAX_POWER,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
+    ZERO_EXPORT_CD_TIME,
+    ZERO_EXPORT_INTERVAL,
+    ZERO_EXPORT_MAX_POWER,
+    ZERO_EXPORT_TARGET,
+)
 from .coordinator import MarstekVenusE3Coordinator
+from .deadband import Deadband
+from .dispatcher import FleetDispatcher
+from .fleet import MarstekFleet
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -44,47 +80,134 @@ def convert_days_to_bitmap(days: list[str]) -> int:
 
 
 # Service schema
-SERVICE_SET_MODE_SCHEMA = vol.Schema(
+SERVICE_SET_MODE_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional("device_id"): vol.All(cv.ensure_list, [str]),
+            vol.Optional("area_id"): vol.All(cv.ensure_list, [str]),
+            vol.Required("mode"): vol.In(["0", "1", "2", "3"]),
+            vol.Optional("start_time"): str,
+            vol.Optional("end_time"): str,
+            vol.Optional("days"): [str],
+            vol.Optional("week_set", default=127): vol.All(int, vol.Range(min=0, max=127)),
+            vol.Optional("power", default=0): vol.All(int, vol.Range(min=-MAX_POWER, max=MAX_POWER)),
+            vol.Optional("enable", default=1): vol.All(int, vol.Range(min=0, max=1)),
+            vol.Optional("time_num", default=1): vol.All(int, vol.Range(min=0, max=9)),
+            vol.Optional("cd_time"): vol.All(int, vol.Range(min=0, max=86400)),  # Duration in seconds (0-24h)
+        }
+    ),
+    cv.has_at_least_one_key("device_id", "area_id"),
+)
+
+SCHEDULE_SLOT_SCHEMA = vol.Schema(
     {
-        vol.Required("device_id"): str,
-        vol.Required("mode"): vol.In(["0", "1", "2", "3"]),
-        vol.Optional("start_time"): str,
-        vol.Optional("end_time"): str,
+        vol.Required("time_num"): vol.All(vol.Coerce(int), vol.Range(min=0, max=9)),
+        vol.Required("start_time"): str,
+        vol.Required("end_time"): str,
         vol.Optional("days"): [str],
         vol.Optional("week_set", default=127): vol.All(int, vol.Range(min=0, max=127)),
-        vol.Optional("power", default=0): vol.All(int, vol.Range(min=-3000, max=3000)),
+        vol.Optional("power", default=0): vol.All(int, vol.Range(min=-MAX_POWER, max=MAX_POWER)),
         vol.Optional("enable", default=1): vol.All(int, vol.Range(min=0, max=1)),
-        vol.Optional("time_num", default=1): vol.All(int, vol.Range(min=0, max=9)),
-        vol.Optional("cd_time"): vol.All(int, vol.Range(min=0, max=86400)),  # Duration in seconds (0-24h)
     }
 )
 
 
+def _unique_time_nums(slots: list[dict]) -> list[dict]:
+    """Reject a plan programming the same slot twice."""
+    time_nums = [slot["time_num"] for slot in slots]
+    if len(set(time_nums)) != len(time_nums):
+        raise vol.Invalid("each time_num can only appear once")
+    return slots
+
+
+SERVICE_SET_SCHEDULE_SCHEMA = vol.Schema(
+    {
+        vol.Required("device_id"): str,
+        vol.Required("slots"): vol.All(
+            [SCHEDULE_SLOT_SCHEMA],
+            vol.Length(min=1, max=10),
+            _unique_time_nums,
+        ),
+        vol.Optional("force", default=False): bool,
+    }
+)
+
+SERVICE_START_ZERO_EXPORT_SCHEMA = vol.Schema(
+    {
+        vol.Required("device_id"): str,
+        vol.Optional("target_power", default=ZERO_EXPORT_TARGET): vol.All(
+            vol.Coerce(int), vol.Range(min=-1000, max=1000)
+        ),
+        vol.Optional("max_power", default=ZERO_EXPORT_MAX_POWER): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=MAX_POWER)
+        ),
+        vol.Optional("interval", default=ZERO_EXPORT_INTERVAL): vol.All(
+            vol.Coerce(float), vol.Range(min=0.5, max=10)
+        ),
+        vol.Optional("cd_time", default=ZERO_EXPORT_CD_TIME): vol.All(
+            vol.Coerce(int), vol.Range(min=10, max=3600)
+        ),
+    }
+)
+
+SERVICE_STOP_ZERO_EXPORT_SCHEMA = vol.Schema(
+    {
+        vol.Required("device_id"): str,
+    }
+)
+
+SERVICE_DISPATCH_POWER_SCHEMA = vol.Schema(
+    {
+        vol.Optional("device_id"): vol.All(cv.ensure_list, [str]),
+        vol.Optional("area_id"): vol.All(cv.ensure_list, [str]),
+        vol.Required("power"): vol.Coerce(int),  # Site target, positive = discharge
+        vol.Optional("cd_time", default=DISPATCH_CD_TIME): vol.All(
+            vol.Coerce(int), vol.Range(min=30, max=86400)
+        ),
+    }
+)
+
+SERVICE_STOP_DISPATCH_SCHEMA = vol.Schema({})
+
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Marstek Venus E 3.0 from a config entry."""
     hass.data.setdefault(DOMAIN, {})
 
     # Get configuration
     ip_address = entry.data[CONF_IP_ADDRESS]
-    port = entry.options.get(
-        CONF_PORT,
-        entry.data.get(CONF_PORT, DEFAULT_PORT),
-    )
-    scan_interval = entry.options.get(
-        CONF_SCAN_INTERVAL,
-        entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
-    )
+    settings = _entry_settings(entry)
+
+    # All batteries share the UDP endpoint of the fleet
+    if DATA_FLEET not in hass.data:
+        hass.data[DATA_FLEET] = MarstekFleet()
+    fleet: MarstekFleet = hass.data[DATA_FLEET]
 
     # Create coordinator
     coordinator = MarstekVenusE3Coordinator(
         hass,
         ip_address,
-        port,
-        scan_interval,
+        transport=fleet.transport,
+        poll_slots=fleet.poll_slots,
+        src=entry.data.get(CONF_SRC),
+        **settings,
     )
 
-    # Fetch initial data
-    await coordinator.async_config_entry_first_refresh()
+    # The device is created up front so services can find it by id
+    device = dr.async_get(hass).async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={(DOMAIN, entry.entry_id)},
+        name=f"Marstek Venus E 3.0 ({ip_address})",
+        manufacturer="Marstek",
+        model="Venus E 3.0",
+    )
+
+    # Register with the fleet (opens the UDP endpoint)
+    await fleet.async_register(coordinator, device.id)
+
+    # Start from the last known state; the first poll runs in the
+    # background so a slow or offline battery does not hold up startup
+    await coordinator.async_restore_snapshot()
 
     # Store coordinator
     hass.data[DOMAIN][entry.entry_id] = coordinator
@@ -92,13 +215,31 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Setup platforms
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Setup options update listener
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_create_background_task(
+        hass,
+        coordinator.async_refresh(),
+        f"{DOMAIN} first refresh {ip_address}",
+    )
+
+    # Setup options update listener. Entry data written by the coordinator
+    # itself (address and identity of the battery) is already applied;
+    # option changes are applied to the running coordinator
+    async def async_entry_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+        """Apply changed options without reloading the entry."""
+        nonlocal settings
+        if (new_settings := _entry_settings(entry)) != settings:
+            settings = new_settings
+            coordinator.async_reconfigure(**settings)
+
+    entry.async_on_unload(entry.add_update_listener(async_entry_updated))
 
     # Register services
-    async def async_set_mode_service(call: ServiceCall) -> None:
-        """Handle the set_mode service call."""
-        device_id = call.data["device_id"]
+    async def async_set_mode_service(call: ServiceCall) -> ServiceResponse:
+        """Handle the set_mode service call.
+
+        The mode is sent to every targeted battery concurrently; the
+        response holds the outcome and latency of each device.
+        """
         mode = int(call.data["mode"])
         start_time = call.data.get("start_time")
         end_time = call.data.get("end_time")
@@ -117,67 +258,295 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         time_num = call.data.get("time_num", 1)
         cd_time = call.data.get("cd_time")
 
-        # Find the coordinator for this device
-        device_registry = dr.async_get(hass)
-        device = device_registry.async_get(device_id)
+        async def async_set_device_mode(
+            device_id: str,
+            coordinator: MarstekVenusE3Coordinator | None,
+        ) -> dict:
+            """Set the mode of one battery."""
+            if coordinator is None:
+                _LOGGER.error("Coordinator not found for device %s", device_id)
+                return {"success": False, "error": "device not found"}
+
+            _stop_dispatching(hass, coordinator)
+            start = time.perf_counter()
+            success = await coordinator.async_set_mode(
+                mode=mode,
+                start_time=start_time,
+                end_time=end_time,
+                week_set=week_set,
+                power=power,
+                enable=enable,
+                time_num=time_num,
+                cd_time=cd_time,
+            )
+            latency = time.perf_counter() - start
+
+            if success:
+                _LOGGER.info("Successfully set mode of %s to %s", coordinator.ip_address, mode)
+                # Force update to get new state
+                await coordinator.async_request_refresh()
+            else:
+                _LOGGER.error("Failed to set mode of %s to %s", coordinator.ip_address, mode)
+            return {"success": success, "latency_ms": round(latency * 1000, 1)}
+
+        targets = _resolve_targets(hass, call.data.get("device_id", []), call.data.get("area_id", []))
+        if not targets:
+            _LOGGER.error("No Marstek Venus E 3.0 device matches the service target")
+        results = await asyncio.gather(
+            *(async_set_device_mode(device_id, coordinator) for device_id, coordinator in targets.items())
+        )
+        return {"devices": dict(zip(targets, results))}
 
-        if not device:
-            _LOGGER.error("Device %s not found", device_id)
+    async def async_set_schedule_service(call: ServiceCall) -> None:
+        """Handle the set_schedule service call."""
+        coordinator = _get_device_coordinator(hass, call.data["device_id"])
+        if coordinator is None:
             return
 
-        # Find the config entry for this device
-        coordinator_entry_id = None
-        for entry_id in device.config_entries:
-            if entry_id in hass.data[DOMAIN]:
-                coordinator_entry_id = entry_id
-                break
+        slots = []
+        for slot in call.data["slots"]:
+            # Support 'days' field (priority) or 'week_set' (backward compatibility)
+            days = slot.get("days")
+            slots.append(
+                {
+                    "time_num": slot["time_num"],
+                    "start_time": slot["start_time"],
+                    "end_time": slot["end_time"],
+                    "week_set": convert_days_to_bitmap(days) if days else slot["week_set"],
+                    "power": slot["power"],
+                    "enable": slot["enable"],
+                }
+            )
+
+        _stop_dispatching(hass, coordinator)
+        force = call.data["force"]
+        if not coordinator.schedule_changes(slots, force):
+            _LOGGER.info("Schedule already programmed, nothing to write")
+            return
+
+        success = await coordinator.async_set_schedule(slots, force=force)
 
-        if not coordinator_entry_id:
-            _LOGGER.error("Coordinator not found for device %s", device_id)
+        if success:
+            _LOGGER.info("Successfully programmed %d schedule slots", len(slots))
+        else:
+            _LOGGER.error("Failed to program the schedule")
+        # A single refresh for the whole plan
+        await coordinator.async_request_refresh()
+
+    async def async_start_zero_export_service(call: ServiceCall) -> None:
+        """Handle the start_zero_export service call."""
+        coordinator = _get_device_coordinator(hass, call.data["device_id"])
+        if coordinator is None:
             return
 
-        coordinator = hass.data[DOMAIN][coordinator_entry_id]
-
-        # Call the set_mode method
-        success = await coordinator.async_set_mode(
-            mode=mode,
-            start_time=start_time,
-            end_time=end_time,
-            week_set=week_set,
-            power=power,
-            enable=enable,
-            time_num=time_num,
-            cd_time=cd_time,
+        _stop_dispatching(hass, coordinator)
+        await coordinator.async_start_zero_export(
+            target=call.data["target_power"],
+            max_power=call.data["max_power"],
+            interval=call.data["interval"],
+            cd_time=call.data["cd_time"],
         )
 
-        if success:
-            _LOGGER.info("Successfully set mode to %s", mode)
-            # Force update to get new state
-            await coordinator.async_request_refresh()
+    async def async_stop_zero_export_service(call: ServiceCall) -> None:
+        """Handle the stop_zero_export service call."""
+        coordinator = _get_device_coordinator(hass, call.data["device_id"])
+        if coordinator is None:
+            return
+
+        await coordinator.async_stop_zero_export()
+
+    async def async_dispatch_power_service(call: ServiceCall) -> ServiceResponse:
+        """Handle the dispatch_power service call.
+
+        The site power is split over the targeted batteries, or over every
+        loaded battery when no target is given; the response holds the
+        share of each device.
+        """
+        fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+        device_ids = call.data.get("device_id", [])
+        area_ids = call.data.get("area_id", [])
+        if device_ids or area_ids:
+            targets = _resolve_targets(hass, device_ids, area_ids)
         else:
-            _LOGGER.error("Failed to set mode to %s", mode)
+            targets = fleet.devices if fleet is not None else {}
+
+        devices: dict[str, dict] = {
+            device_id: {"success": False, "error": "device not found"}
+            for device_id, coordinator in targets.items()
+            if coordinator is None
+        }
+        batteries = {
+            device_id: coordinator
+            for device_id, coordinator in targets.items()
+            if coordinator is not None
+        }
+        if fleet is None or not batteries:
+            _LOGGER.error("No Marstek Venus E 3.0 device matches the service target")
+            return {"devices": devices}
+
+        if fleet.dispatcher is None:
+            fleet.dispatcher = FleetDispatcher(hass)
+        devices.update(
+            await fleet.dispatcher.async_dispatch(
+                call.data["power"], batteries, cd_time=call.data["cd_time"]
+            )
+        )
+        _LOGGER.info("Dispatching %d W over %d batteries", call.data["power"], len(batteries))
+        return {"devices": devices}
 
-    # Register the service only once (for the first entry)
+    async def async_stop_dispatch_service(call: ServiceCall) -> None:
+        """Handle the stop_dispatch service call."""
+        fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+        if fleet is None or fleet.dispatcher is None:
+            return
+
+        await fleet.dispatcher.async_stop()
+        fleet.dispatcher = None
+        _LOGGER.info("Power dispatch stopped")
+
+    # Register the services only once (for the first entry)
     if not hass.services.has_service(DOMAIN, "set_mode"):
         hass.services.async_register(
             DOMAIN,
             "set_mode",
             async_set_mode_service,
             schema=SERVICE_SET_MODE_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+    if not hass.services.has_service(DOMAIN, "set_schedule"):
+        hass.services.async_register(
+            DOMAIN,
+            "set_schedule",
+            async_set_schedule_service,
+            schema=SERVICE_SET_SCHEDULE_SCHEMA,
+        )
+    if not hass.services.has_service(DOMAIN, "start_zero_export"):
+        hass.services.async_register(
+            DOMAIN,
+            "start_zero_export",
+            async_start_zero_export_service,
+            schema=SERVICE_START_ZERO_EXPORT_SCHEMA,
+        )
+    if not hass.services.has_service(DOMAIN, "stop_zero_export"):
+        hass.services.async_register(
+            DOMAIN,
+            "stop_zero_export",
+            async_stop_zero_export_service,
+            schema=SERVICE_STOP_ZERO_EXPORT_SCHEMA,
+        )
+    if not hass.services.has_service(DOMAIN, "dispatch_power"):
+        hass.services.async_register(
+            DOMAIN,
+            "dispatch_power",
+            async_dispatch_power_service,
+            schema=SERVICE_DISPATCH_POWER_SCHEMA,
+            supports_response=SupportsResponse.OPTIONAL,
+        )
+    if not hass.services.has_service(DOMAIN, "stop_dispatch"):
+        hass.services.async_register(
+            DOMAIN,
+            "stop_dispatch",
+            async_stop_dispatch_service,
+            schema=SERVICE_STOP_DISPATCH_SCHEMA,
         )
 
     return True
 
 
+def _get_device_coordinator(
+    hass: HomeAssistant,
+    device_id: str,
+) -> MarstekVenusE3Coordinator | None:
+    """Return the coordinator of a device, logging why if there is none."""
+    fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+    coordinator = fleet.coordinator_for_device(device_id) if fleet is not None else None
+    if coordinator is None:
+        _LOGGER.error("Coordinator not found for device %s", device_id)
+    return coordinator
+
+
+def _stop_dispatching(
+    hass: HomeAssistant,
+    coordinator: MarstekVenusE3Coordinator,
+) -> None:
+    """Take a battery out of the power dispatch before driving it directly."""
+    fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+    if fleet is not None and fleet.dispatcher is not None:
+        fleet.dispatcher.remove(coordinator)
+
+
+def _resolve_targets(
+    hass: HomeAssistant,
+    device_ids: list[str],
+    area_ids: list[str],
+) -> dict[str, MarstekVenusE3Coordinator | None]:
+    """Map the targeted devices to their coordinators.
+
+    Devices of the given areas are included when they are loaded
+    batteries of this integration; explicitly listed devices are always
+    included, with None when no battery is loaded for them.
+    """
+    fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+    targets: dict[str, MarstekVenusE3Coordinator | None] = {}
+    for device_id in device_ids:
+        targets[device_id] = fleet.coordinator_for_device(device_id) if fleet is not None else None
+
+    if area_ids and fleet is not None:
+        device_registry = dr.async_get(hass)
+        for area_id in area_ids:
+            for device in dr.async_entries_for_area(device_registry, area_id):
+                coordinator = fleet.coordinator_for_device(device.id)
+                if coordinator is not None:
+                    targets[device.id] = coordinator
+    return targets
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_stop_zero_export()
+        await _async_release_fleet(hass, coordinator)
 
     return unload_ok
 
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the last known state of a removed battery."""
+    await Store(hass, SNAPSHOT_STORAGE_VERSION, f"{SNAPSHOT_STORAGE_KEY}.{entry.entry_id}").async_remove()
+
+
+def _entry_settings(entry: ConfigEntry) -> dict:
+    """Return the coordinator settings of a config entry.
+
+    Options take precedence over the data entered when the battery was
+    added.
+    """
+    fast_scan_interval = None
+    if entry.options.get(CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING):
+        fast_scan_interval = entry.options.get(CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL)
+    return {
+        "port": entry.options.get(CONF_PORT, entry.data.get(CONF_PORT, DEFAULT_PORT)),
+        "scan_interval": entry.options.get(
+            CONF_SCAN_INTERVAL,
+            entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
+        ),
+        "fast_scan_interval": fast_scan_interval,
+        "timeout": entry.options.get(CONF_TIMEOUT, DEFAULT_TIMEOUT),
+        "max_retries": entry.options.get(CONF_MAX_RETRIES, DEFAULT_MAX_RETRIES),
+        "deadband": Deadband(
+            absolute=entry.options.get(CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND),
+            percent=entry.options.get(CONF_POWER_DEADBAND_PERCENT, DEFAULT_POWER_DEADBAND_PERCENT),
+            heartbeat=entry.options.get(CONF_POWER_HEARTBEAT, DEFAULT_POWER_HEARTBEAT),
+        ),
+    }
+
+
+async def _async_release_fleet(
+    hass: HomeAssistant,
+    coordinator: MarstekVenusE3Coordinator,
+) -> None:
+    """Unregister a coordinator and drop the fleet once it is empty."""
+    fleet: MarstekFleet | None = hass.data.get(DATA_FLEET)
+    if fleet is not None and await fleet.async_unregister(coordinator):
+        hass.data.pop(DATA_FLEET)
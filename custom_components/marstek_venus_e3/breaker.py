@@ -0,0 +1,49 @@
+"""Circuit breaker for unreachable Marstek Venus E 3.0 batteries."""
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_PROBE_INTERVAL,
+    BREAKER_PROBE_INTERVAL,
+)
+
+
+class CircuitBreaker:
+    """Track consecutive poll failures of a battery.
+
+    After failure_threshold failed polls in a row the breaker opens: the
+    battery is then only probed with a single request, at an interval that
+    doubles after every failed probe up to max_probe_interval. The first
+    successful reply closes the breaker again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        probe_interval: float = BREAKER_PROBE_INTERVAL,
+        max_probe_interval: float = BREAKER_MAX_PROBE_INTERVAL,
+    ) -> None:
+        """Initialize the breaker."""
+        self.failure_threshold = failure_threshold
+        self.min_probe_interval = probe_interval
+        self.max_probe_interval = max(max_probe_interval, probe_interval)
+        self.failures = 0
+        self.probe_interval = probe_interval
+
+    @property
+    def is_open(self) -> bool:
+        """Return True while the battery is considered offline."""
+        return self.failures >= self.failure_threshold
+
+    def record_success(self) -> bool:
+        """Record a good reply; return True if the breaker was open."""
+        was_open = self.is_open
+        self.failures = 0
+        self.probe_interval = self.min_probe_interval
+        return was_open
+
+    def record_failure(self) -> bool:
+        """Record a failed poll or probe; return True if the breaker just opened."""
+        was_open = self.is_open
+        self.failures += 1
+        if was_open:
+            self.probe_interval = min(self.probe_interval * 2, self.max_probe_interval)
+        return self.is_open and not was_open
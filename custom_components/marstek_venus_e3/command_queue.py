@@ -0,0 +1,66 @@
+"""Per-battery command queue for Marstek Venus E 3.0."""
+import asyncio
+import contextlib
+import heapq
+import itertools
+from collections.abc import AsyncIterator
+
+# Lower values are sent first
+PRIORITY_CONTROL = 0  # Mode changes, schedules and the zero-export loop
+PRIORITY_POLL = 1  # Background status queries
+
+
+class CommandQueue:
+    """Admit the requests of one battery by priority.
+
+    At most max_in_flight requests are outstanding at once. When more are
+    waiting, the one with the lowest priority value is sent first, in
+    arrival order within a priority, so control writes overtake queued
+    polls.
+    """
+
+    def __init__(self, max_in_flight: int) -> None:
+        """Initialize the queue."""
+        self._free = max_in_flight
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        """Hold one in-flight slot for the duration of the block."""
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        """Wait for a free slot."""
+        # Requests only wait while no slot is free
+        if self._free > 0:
+            self._free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        """Hand the slot to the next waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
@@ -10,12 +10,36 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 import homeassistant.helpers.config_validation as cv
 
-from .const import DOMAIN, CONF_IP_ADDRESS, CONF_PORT, DEFAULT_PORT, DEFAULT_SCAN_INTERVAL
-from .coordinator import MarstekVenusE3Coordinator
+from .const import (
+    DOMAIN,
+    CONF_ADAPTIVE_POLLING,
+    CONF_FAST_SCAN_INTERVAL,
+    CONF_IP_ADDRESS,
+    CONF_MAX_RETRIES,
+    CONF_PORT,
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+    CONF_POWER_HEARTBEAT,
+    CONF_SRC,
+    CONF_TIMEOUT,
+    DEFAULT_ADAPTIVE_POLLING,
+    DEFAULT_FAST_SCAN_INTERVAL,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_PORT,
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_POWER_DEADBAND_PERCENT,
+    DEFAULT_POWER_HEARTBEAT,
+    DEFAULT_SCAN_INTERVAL,
+    DEFAULT_TIMEOUT,
+)
+from .discovery import DiscoveredBattery, async_discover, async_probe_host
 
 _LOGGER = logging.getLogger(__name__)
 
-STEP_USER_DATA_SCHEMA = vol.Schema(
+CONF_DEVICE = "device"
+MANUAL_ENTRY = "manual"
+
+STEP_MANUAL_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_IP_ADDRESS, default="192.168.0.182"): cv.string,
         vol.Optional(CONF_PORT, default=DEFAULT_PORT): cv.port,
@@ -25,19 +49,18 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
-    """Validate the user input allows us to connect."""
-    coordinator = MarstekVenusE3Coordinator(
-        hass,
-        data[CONF_IP_ADDRESS],
-        data.get(CONF_PORT, DEFAULT_PORT),
-        data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
-    )
+    """Validate the user input allows us to connect.
 
-    # Test the connection by calling the update method directly
-    # (async_config_entry_first_refresh requires a config entry which we don't have yet)
-    await coordinator._async_update_data()
+    Only the device query is sent, so an unreachable address fails within
+    a couple of seconds instead of going through a full retried poll.
+    """
+    ip_address = data[CONF_IP_ADDRESS]
+    port = data.get(CONF_PORT, DEFAULT_PORT)
+    battery = await async_probe_host(ip_address, port)
+    if battery is None:
+        raise ConnectionError(f"No reply to the device query from {ip_address}:{port}")
 
-    return {"title": f"Marstek Venus E 3.0 ({data[CONF_IP_ADDRESS]})"}
+    return {"title": f"Marstek Venus E 3.0 ({ip_address})", "src": battery.src}
 
 
 class MarstekVenusE3ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -45,10 +68,75 @@ class MarstekVenusE3ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    def __init__(self) -> None:
+        """Initialize the flow."""
+        self._discovered: dict[str, DiscoveredBattery] = {}
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the initial step."""
+        """Handle the initial step.
+
+        The local network is searched for batteries first; the user picks
+        one of them, or enters an address by hand. The other batteries
+        found are offered as discovered devices.
+        """
+        if user_input is not None:
+            if user_input[CONF_DEVICE] == MANUAL_ENTRY:
+                return await self.async_step_manual()
+
+            battery = self._discovered[user_input[CONF_DEVICE]]
+            for other in self._discovered.values():
+                if other is not battery:
+                    self._async_offer(other)
+            return await self._async_create_discovered_entry(battery)
+
+        configured = self._async_current_ids()
+        found = await async_discover(self.hass, DEFAULT_PORT)
+        self._discovered = {
+            src: battery for src, battery in sorted(found.items()) if battery.ip not in configured
+        }
+        if not self._discovered:
+            return await self.async_step_manual()
+
+        choices = {src: battery.label for src, battery in self._discovered.items()}
+        choices[MANUAL_ENTRY] = "Enter an IP address"
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({vol.Required(CONF_DEVICE): vol.In(choices)}),
+            description_placeholders={"count": str(len(self._discovered))},
+        )
+
+    async def async_step_integration_discovery(
+        self, discovery_info: dict[str, Any]
+    ) -> FlowResult:
+        """Handle a battery found while setting up another one."""
+        battery = DiscoveredBattery(src=discovery_info[CONF_SRC], ip=discovery_info[CONF_IP_ADDRESS])
+        await self.async_set_unique_id(battery.ip)
+        self._abort_if_unique_id_configured()
+
+        self._discovered = {battery.src: battery}
+        self.context["title_placeholders"] = {"name": battery.label}
+        return await self.async_step_discovery_confirm()
+
+    async def async_step_discovery_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Confirm the setup of a discovered battery."""
+        battery = next(iter(self._discovered.values()))
+        if user_input is not None:
+            return await self._async_create_discovered_entry(battery)
+
+        self._set_confirm_only()
+        return self.async_show_form(
+            step_id="discovery_confirm",
+            description_placeholders={"src": battery.src, "ip": battery.ip},
+        )
+
+    async def async_step_manual(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle a manually entered address."""
         errors: dict[str, str] = {}
 
         if user_input is not None:
@@ -64,14 +152,43 @@ class MarstekVenusE3ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 await self.async_set_unique_id(user_input[CONF_IP_ADDRESS])
                 self._abort_if_unique_id_configured()
 
-                return self.async_create_entry(title=info["title"], data=user_input)
+                return self.async_create_entry(
+                    title=info["title"],
+                    data={**user_input, CONF_SRC: info["src"]},
+                )
 
         return self.async_show_form(
-            step_id="user",
-            data_schema=STEP_USER_DATA_SCHEMA,
+            step_id="manual",
+            data_schema=STEP_MANUAL_DATA_SCHEMA,
             errors=errors,
         )
 
+    async def _async_create_discovered_entry(self, battery: DiscoveredBattery) -> FlowResult:
+        """Create the entry of a discovered battery with the default settings."""
+        await self.async_set_unique_id(battery.ip)
+        self._abort_if_unique_id_configured()
+
+        return self.async_create_entry(
+            title=f"Marstek Venus E 3.0 ({battery.ip})",
+            data={
+                CONF_IP_ADDRESS: battery.ip,
+                CONF_PORT: DEFAULT_PORT,
+                CONF_SCAN_INTERVAL: DEFAULT_SCAN_INTERVAL,
+                CONF_SRC: battery.src,
+            },
+        )
+
+    @callback
+    def _async_offer(self, battery: DiscoveredBattery) -> None:
+        """Start a discovery flow for a battery the user did not pick."""
+        self.hass.async_create_task(
+            self.hass.config_entries.flow.async_init(
+                DOMAIN,
+                context={"source": config_entries.SOURCE_INTEGRATION_DISCOVERY},
+                data={CONF_IP_ADDRESS: battery.ip, CONF_SRC: battery.src},
+            )
+        )
+
     @staticmethod
     @callback
     def async_get_options_flow(
@@ -113,6 +230,46 @@ class MarstekVenusE3OptionsFlowHandler(config_entries.OptionsFlow):
                             self.config_entry.data.get(CONF_SCAN_INTERVAL, DEFAULT_SCAN_INTERVAL),
                         ),
                     ): cv.positive_int,
+                    vol.Optional(
+                        CONF_ADAPTIVE_POLLING,
+                        default=self.config_entry.options.get(
+                            CONF_ADAPTIVE_POLLING, DEFAULT_ADAPTIVE_POLLING
+                        ),
+                    ): cv.boolean,
+                    vol.Optional(
+                        CONF_FAST_SCAN_INTERVAL,
+                        default=self.config_entry.options.get(
+                            CONF_FAST_SCAN_INTERVAL, DEFAULT_FAST_SCAN_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=60)),
+                    vol.Optional(
+                        CONF_TIMEOUT,
+                        default=self.config_entry.options.get(CONF_TIMEOUT, DEFAULT_TIMEOUT),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=10)),
+                    vol.Optional(
+                        CONF_MAX_RETRIES,
+                        default=self.config_entry.options.get(
+                            CONF_MAX_RETRIES, DEFAULT_MAX_RETRIES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=10)),
+                    vol.Optional(
+                        CONF_POWER_DEADBAND,
+                        default=self.config_entry.options.get(
+                            CONF_POWER_DEADBAND, DEFAULT_POWER_DEADBAND
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1000)),
+                    vol.Optional(
+                        CONF_POWER_DEADBAND_PERCENT,
+                        default=self.config_entry.options.get(
+                            CONF_POWER_DEADBAND_PERCENT, DEFAULT_POWER_DEADBAND_PERCENT
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=50)),
+                    vol.Optional(
+                        CONF_POWER_HEARTBEAT,
+                        default=self.config_entry.options.get(
+                            CONF_POWER_HEARTBEAT, DEFAULT_POWER_HEARTBEAT
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=10, max=3600)),
                 }
             ),
         )
@@ -5,15 +5,109 @@ DOMAIN = "marstek_venus_e3"
 # Configuration
 CONF_IP_ADDRESS = "ip_address"
 CONF_PORT = "port"
+CONF_SRC = "src"
+CONF_TIMEOUT = "timeout"
+CONF_MAX_RETRIES = "max_retries"
 DEFAULT_PORT = 30000
 DEFAULT_SCAN_INTERVAL = 60
-DEFAULT_TIMEOUT = 2.0
-DEFAULT_MAX_RETRIES = 3
+DEFAULT_TIMEOUT = 2.0  # Per attempt, in seconds
+DEFAULT_MAX_RETRIES = 3  # Attempts for writes
+DEFAULT_READ_MAX_RETRIES = 2  # Attempts for status queries
+DEFAULT_READ_DEADLINE = 4.0  # Overall budget of a status query, in seconds
+DEFAULT_WRITE_DEADLINE = 12.0  # Overall budget of a write, in seconds
+DEFAULT_BACKOFF_BASE = 0.25  # Jittered backoff cap after the first attempt, in seconds
+DEFAULT_BACKOFF_MAX = 2.0
+
+DEVICE_MAX_IN_FLIGHT = 3  # Requests outstanding at once towards one battery
+
+# Request pacing (learned per battery)
+PACER_BURST = 1  # Requests that may be sent back to back once pacing is active
+PACER_ERROR_GAP = 0.05  # Gap between requests after the first overload sign, in seconds
+PACER_MAX_GAP = 1.0
+PACER_GAP_DECREASE = 0.002  # Gap removed after each clean reply, in seconds
+
+# Circuit breaker for unreachable batteries
+BREAKER_FAILURE_THRESHOLD = 3  # Failed polls in a row before probing only
+BREAKER_PROBE_INTERVAL = 30  # First probe interval, in seconds
+BREAKER_MAX_PROBE_INTERVAL = 600
+
+# Adaptive polling
+CONF_ADAPTIVE_POLLING = "adaptive_polling"
+CONF_FAST_SCAN_INTERVAL = "fast_scan_interval"
+DEFAULT_ADAPTIVE_POLLING = False
+DEFAULT_FAST_SCAN_INTERVAL = 2
+ADAPTIVE_POWER_THRESHOLD = 50  # W change between polls that counts as activity
+ADAPTIVE_HOLD_TIME = 30  # Seconds of fast polling after activity or a mode change
+ADAPTIVE_WATCHED_KEYS = ("ongrid_power", "total_power")
+
+# Power sensor deadband (state publication only, raw values stay in the data)
+CONF_POWER_DEADBAND = "power_deadband"
+CONF_POWER_DEADBAND_PERCENT = "power_deadband_percent"
+CONF_POWER_HEARTBEAT = "power_heartbeat"
+DEFAULT_POWER_DEADBAND = 0  # Change from the published value needed to publish, in W (0 = off)
+DEFAULT_POWER_DEADBAND_PERCENT = 0  # Same, in % of the published value (0 = off)
+DEFAULT_POWER_HEARTBEAT = 300  # Longest time a changed reading is held back, in seconds
+
+# Rolling statistics of the power readings
+STATISTICS_WINDOWS = (60, 300, 900)  # Window lengths, in seconds
+STATISTICS_MAX_SAMPLES = 1024  # Ring buffer size limit per reading
+
+# Energy integrated from the power readings
+ENERGY_MAX_GAP = 300  # Longer intervals between two readings are not integrated, in seconds
+
+MAX_POWER = 3000  # Charge and discharge limit accepted by ES.SetMode, in W
+
+# Fleet power dispatcher (Passive mode)
+DISPATCH_CD_TIME = 300  # Passive mode countdown sent with each write, in seconds
+DISPATCH_DEADBAND = 50  # Share changes smaller than this are not written, in W
+DISPATCH_MIN_SOC = 10  # Batteries at or below this SOC get no discharge share
+DISPATCH_MAX_SOC = 100  # Batteries at or above this SOC get no charge share
+
+# Zero-export control loop (Passive mode)
+ZERO_EXPORT_INTERVAL = 1.0  # Seconds between two grid meter reads
+ZERO_EXPORT_TARGET = 0  # Grid power to settle at, in W (positive = import)
+ZERO_EXPORT_MAX_POWER = 2500  # Charge and discharge limit of the setpoint, in W
+ZERO_EXPORT_GAIN = 0.7  # Share of the grid error corrected on each step
+ZERO_EXPORT_DEADBAND = 20  # Setpoint changes smaller than this are not written, in W
+ZERO_EXPORT_CD_TIME = 60  # Passive mode countdown sent with each write, in seconds
+
+# Discovery (config flow)
+DISCOVERY_BROADCAST_WAIT = 1.5  # Time to collect replies to the broadcast query, in seconds
+DISCOVERY_PROBE_WAIT = 0.75  # Time to collect replies after the last subnet probe, in seconds
+DISCOVERY_PROBE_BURST = 32  # Subnet probes sent back to back
+DISCOVERY_PROBE_GAP = 0.005  # Gap between subnet probes after the burst, in seconds
+DISCOVERY_MAX_HOSTS = 1024  # Larger networks are only probed within the local /24
+DISCOVERY_CONNECT_TIMEOUT = 1.0  # Per attempt when checking a manually entered address
+DISCOVERY_CONNECT_ATTEMPTS = 2
+RELOCATE_INTERVAL = 300  # Minimum time between two searches for a battery that moved, in seconds
+
+# Last known state, restored on startup
+SNAPSHOT_STORAGE_KEY = f"{DOMAIN}.snapshot"  # Followed by the config entry id
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 300  # Seconds between two writes of the snapshot to disk
+
+# Fleet (shared UDP endpoint for all batteries)
+DATA_FLEET = f"{DOMAIN}_fleet"
+FLEET_MAX_CONCURRENT_POLLS = 32
+FLEET_RECEIVE_BUFFER = 1024 * 1024
 
 # UDP Commands
 CMD_GET_MODE = "ES.GetMode"
+CMD_GET_ES_STATUS = "ES.GetStatus"
 CMD_GET_BAT_STATUS = "Bat.GetStatus"
+CMD_GET_PV_STATUS = "PV.GetStatus"
+CMD_GET_EM_STATUS = "EM.GetStatus"
 CMD_SET_MODE = "ES.SetMode"
+CMD_GET_DEVICE = "Marstek.GetDevice"
+
+# Status queries sent concurrently on every poll
+POLL_COMMANDS = (
+    CMD_GET_MODE,
+    CMD_GET_ES_STATUS,
+    CMD_GET_BAT_STATUS,
+    CMD_GET_PV_STATUS,
+    CMD_GET_EM_STATUS,
+)
 
 # Sensor keys
 SENSOR_SOC = "soc"
@@ -0,0 +1,148 @@
+"""Zero-export control loop for Marstek Venus E 3.0."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+from .const import (
+    CMD_GET_EM_STATUS,
+    CMD_SET_MODE,
+    ZERO_EXPORT_CD_TIME,
+    ZERO_EXPORT_DEADBAND,
+    ZERO_EXPORT_GAIN,
+    ZERO_EXPORT_INTERVAL,
+    ZERO_EXPORT_MAX_POWER,
+    ZERO_EXPORT_TARGET,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import MarstekVenusE3Coordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ZeroExportController:
+    """Keep the grid power at a target by driving the Passive mode setpoint.
+
+    Every interval the grid meter is read with EM.GetStatus and the
+    Passive mode power (positive = discharge) is corrected by a share of
+    the difference between the grid power (positive = import) and the
+    target. Reads and writes are sent once, without retry or backoff: a
+    lost packet is corrected by the next step. The setpoint is written
+    again before its cd_time countdown runs out even when it is unchanged,
+    so the battery only leaves Passive mode when the loop stops.
+    """
+
+    def __init__(
+        self,
+        coordinator: MarstekVenusE3Coordinator,
+        target: float = ZERO_EXPORT_TARGET,
+        max_power: int = ZERO_EXPORT_MAX_POWER,
+        interval: float = ZERO_EXPORT_INTERVAL,
+        cd_time: int = ZERO_EXPORT_CD_TIME,
+        gain: float = ZERO_EXPORT_GAIN,
+        deadband: int = ZERO_EXPORT_DEADBAND,
+    ) -> None:
+        """Initialize the controller."""
+        self.coordinator = coordinator
+        self.target = target
+        self.max_power = max_power
+        self.interval = interval
+        self.cd_time = cd_time
+        self.gain = gain
+        self.deadband = deadband
+        self.setpoint = 0
+        self.grid_power: int | None = None
+        self._written_at: float | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_running(self) -> bool:
+        """Return True while the loop runs."""
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start the loop in the background."""
+        if self.is_running:
+            return
+        self._task = self.coordinator.hass.async_create_background_task(
+            self._async_run(),
+            f"marstek_venus_e3 zero-export {self.coordinator.ip_address}",
+        )
+
+    async def async_stop(self) -> None:
+        """Stop the loop.
+
+        The last setpoint stays active until its cd_time runs out.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _async_run(self) -> None:
+        """Run a step every interval, on a fixed schedule."""
+        loop = asyncio.get_running_loop()
+        scheduled = loop.time()
+        while True:
+            self.coordinator.metrics.control.record_step(max(0.0, loop.time() - scheduled))
+            try:
+                await self.async_step()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Zero-export step failed for %s: %s", self.coordinator.ip_address, err)
+
+            scheduled += self.interval
+            now = loop.time()
+            if scheduled < now:
+                # A step overran; skip the missed slots instead of bursting
+                scheduled += (now - scheduled) // self.interval * self.interval + self.interval
+            await asyncio.sleep(scheduled - now)
+
+    async def async_step(self) -> None:
+        """Read the grid meter and write a new setpoint if needed."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        response = await self.coordinator.async_send_once(
+            CMD_GET_EM_STATUS, {"id": 0}, timeout=self.interval
+        )
+        result = response.get("result")
+        if result is None:
+            _LOGGER.debug("No grid meter reading from %s: %s", self.coordinator.ip_address, response)
+            return
+        self.grid_power = self._grid_power(result)
+
+        setpoint = round(self.setpoint + self.gain * (self.grid_power - self.target))
+        setpoint = max(-self.max_power, min(self.max_power, setpoint))
+
+        renew = self._written_at is None or started - self._written_at >= self.cd_time / 2
+        if abs(setpoint - self.setpoint) < self.deadband and not renew:
+            return
+
+        response = await self.coordinator.async_send_once(
+            CMD_SET_MODE,
+            self.coordinator.passive_mode_params(setpoint, self.cd_time),
+            timeout=self.interval,
+        )
+        if not self.coordinator.set_mode_succeeded(response):
+            _LOGGER.debug("Setpoint %d W rejected by %s: %s", setpoint, self.coordinator.ip_address, response)
+            return
+
+        self.setpoint = setpoint
+        self._written_at = started
+        self.coordinator.metrics.control.record_actuation(loop.time() - started)
+
+    @staticmethod
+    def _grid_power(result: dict[str, Any]) -> int:
+        """Return the grid power of an EM.GetStatus result."""
+        total = result.get("total_power")
+        if total is not None:
+            return total
+        return sum(result.get(phase, 0) for phase in ("a_power", "b_power", "c_power"))
@@ -1,26 +1,66 @@
 """Data coordinator for Marstek Venus E 3.0."""
 import asyncio
-import json
 import logging
-import socket
+import math
+import time
+from contextlib import nullcontext
 from datetime import timedelta
 from typing import Any
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
     DOMAIN,
+    CONF_IP_ADDRESS,
+    CONF_SRC,
+    DEFAULT_MAX_RETRIES,
     DEFAULT_PORT,
     DEFAULT_TIMEOUT,
-    DEFAULT_MAX_RETRIES,
     CMD_GET_MODE,
+    CMD_SET_MODE,
+    POLL_COMMANDS,
+    BREAKER_PROBE_INTERVAL,
+    DEVICE_MAX_IN_FLIGHT,
+    ENERGY_MAX_GAP,
+    RELOCATE_INTERVAL,
+    SNAPSHOT_SAVE_DELAY,
+    SNAPSHOT_STORAGE_KEY,
+    SNAPSHOT_STORAGE_VERSION,
+    STATISTICS_MAX_SAMPLES,
+    STATISTICS_WINDOWS,
 )
+from .breaker import CircuitBreaker
+from .command_queue import PRIORITY_CONTROL, PRIORITY_POLL, CommandQueue
+from .controller import ZeroExportController
+from .deadband import Deadband
+from .discovery import async_locate
+from .energy import EnergyIntegrator
+from .fields import ENERGY_SOURCES, STATISTICS_SOURCES, BatteryData, decode
+from .metrics import DeviceMetrics
+from .pacer import RequestPacer
+from .retry import DEFAULT_RETRY_POLICIES, PROBE_POLICY, READ_POLICY, RetryPolicy, scaled_policies
+from .rolling import RollingStatistics
+from .scheduler import AdaptivePollScheduler
+from .transport import MarstekUdpTransport
 
 _LOGGER = logging.getLogger(__name__)
 
 
-class MarstekVenusE3Coordinator(DataUpdateCoordinator):
+class _PendingWrite:
+    """A write waiting for its first slot in the command queue."""
+
+    __slots__ = ("params", "future")
+
+    def __init__(self, params: dict[str, Any], future: asyncio.Future) -> None:
+        """Initialize the write."""
+        self.params = params
+        self.future = future
+
+
+class MarstekVenusE3Coordinator(DataUpdateCoordinator[BatteryData]):
     """Class to manage fetching Marstek Venus E 3.0 data."""
 
     def __init__(
@@ -29,8 +69,25 @@ class MarstekVenusE3Coordinator(DataUpdateCoordinator):
         ip_address: str,
         port: int = DEFAULT_PORT,
         scan_interval: int = 30,
+        transport: MarstekUdpTransport | None = None,
+        fast_scan_interval: int | None = None,
+        src: str | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        deadband: Deadband | None = None,
+        poll_slots: asyncio.Semaphore | None = None,
     ) -> None:
-        """Initialize the coordinator."""
+        """Initialize the coordinator.
+
+        When no transport is given the coordinator owns a private UDP
+        endpoint; otherwise it shares the one of the fleet. Passing a
+        fast_scan_interval enables adaptive polling between it and
+        scan_interval. src is the identity of the battery, learned from
+        its replies when not given. timeout and max_retries set the retry
+        budget (see scaled_policies). deadband filters the states published
+        by the power sensors; the data keeps the raw readings. poll_slots
+        bounds the number of batteries polled at once across the fleet.
+        """
         super().__init__(
             hass,
             _LOGGER,
@@ -39,207 +96,654 @@ class MarstekVenusE3Coordinator(DataUpdateCoordinator):
         )
         self.ip_address = ip_address
         self.port = port
-        self.timeout = DEFAULT_TIMEOUT
-        self.max_retries = DEFAULT_MAX_RETRIES
+        self.src = src
+        self.scan_interval = scan_interval
+        self.deadband = deadband or Deadband()
+        self.retry_policies: dict[str, RetryPolicy] = dict(DEFAULT_RETRY_POLICIES)
+        self.read_policy = READ_POLICY
+        self.probe_policy = PROBE_POLICY
+        if (timeout, max_retries) != (DEFAULT_TIMEOUT, DEFAULT_MAX_RETRIES):
+            self._set_retry_budget(timeout, max_retries)
+        self._owns_transport = transport is None
+        self.transport = transport or MarstekUdpTransport()
+        self._poll_slots = poll_slots
+        self.scheduler: AdaptivePollScheduler | None = None
+        if fast_scan_interval is not None:
+            self.scheduler = AdaptivePollScheduler(fast_scan_interval, scan_interval)
+        self.breaker = CircuitBreaker(
+            probe_interval=max(BREAKER_PROBE_INTERVAL, scan_interval),
+        )
+        self.metrics = DeviceMetrics()
+        self.statistics = RollingStatistics(
+            STATISTICS_SOURCES, STATISTICS_WINDOWS, self._statistics_capacity()
+        )
+        self.energy = EnergyIntegrator(ENERGY_SOURCES, self._energy_max_gap())
+        # Manual mode slots last written to the battery, by time_num
+        self.manual_slots: dict[int, dict[str, Any]] = {}
+        self.zero_export: ZeroExportController | None = None
+        self.queue = CommandQueue(DEVICE_MAX_IN_FLIGHT)
+        self.pacer = RequestPacer()
+        self._pending_writes: dict[str, _PendingWrite] = {}
+        self._last_write_at = 0.0
+        self._polling = False
+        self._poll_sent_at: float | None = None
+        self._data_sent_at = 0.0
+        # Set when another battery answers at our address
+        self._address_taken = False
+        self._located_at: float | None = None
+        # Last known state, kept on disk per config entry
+        self._store: Store | None = None
+        if self.config_entry is not None:
+            self._store = Store(
+                hass,
+                SNAPSHOT_STORAGE_VERSION,
+                f"{SNAPSHOT_STORAGE_KEY}.{self.config_entry.entry_id}",
+            )
+        self._snapshot_pending = False
+        # Data keys changed by the last poll; None when every listener
+        # must be updated
+        self._changed_keys: set[str] | None = None
+
+    async def _async_update_data(self) -> BatteryData:
+        """Fetch data from the battery.
+
+        All status queries are queued at once and sent as the command queue
+        frees up slots, without waiting for each other. Queries fail fast; the
+        fields of a failed query keep their values from the previous
+        snapshot.
+
+        While the circuit breaker is open the battery is only probed with a
+        single ES.GetMode request; the full poll resumes on the first reply.
+        """
+        self._polling = True
+        self._poll_sent_at = None
+        self._changed_keys = None
+        try:
+            try:
+                return await self._async_poll()
+            except UpdateFailed:
+                if not await self._async_relocate():
+                    raise
+            # Found at a new address: poll it right away
+            return await self._async_poll()
+        finally:
+            self._polling = False
+
+    async def _async_poll(self) -> BatteryData:
+        """Poll the battery once a fleet poll slot is free."""
+        async with self._poll_slots or nullcontext():
+            return await self._async_poll_battery()
+
+    async def _async_poll_battery(self) -> BatteryData:
+        """Probe if needed, then query every status command."""
+        if self.breaker.is_open:
+            await self._async_probe()
+
+        results = await asyncio.gather(
+            *(self._execute_command_with_retry(command) for command in POLL_COMMANDS),
+            return_exceptions=True,
+        )
+
+        responses: dict[str, dict[str, Any]] = {}
+        errors: list[str] = []
+        for command, result in zip(POLL_COMMANDS, results):
+            if isinstance(result, BaseException):
+                _LOGGER.debug("Command %s failed during poll: %s", command, result)
+                errors.append(f"{command}: {result}")
+            else:
+                responses[command] = result
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Fetch data from the battery."""
+        if not responses:
+            if self.breaker.record_failure():
+                _LOGGER.warning(
+                    "Battery at %s is not responding, probing every %ss until it is back",
+                    self.ip_address,
+                    self.breaker.probe_interval,
+                )
+            if self.breaker.is_open:
+                self.update_interval = timedelta(seconds=self.breaker.probe_interval)
+            raise UpdateFailed(f"Error communicating with device: {'; '.join(errors)}")
+
+        self._check_identity()
+        self.breaker.record_success()
+
+        # Decode the data, keeping previous values of the failed queries
+        data = decode(responses, self.data)
+        now = time.monotonic()
+        self.statistics.add(now, data, responses)
+        self.energy.add(now, data, responses)
+
+        if self.scheduler is not None:
+            interval = self.scheduler.next_interval(data, time.monotonic())
+            self.update_interval = timedelta(seconds=interval)
+        else:
+            self.update_interval = timedelta(seconds=self.scan_interval)
+
+        if self.last_update_success and self.data is not None:
+            self._changed_keys = data.changes(self.data)
+
+        self._data_sent_at = self._poll_sent_at or 0.0
+        self._async_save_snapshot()
+        return data
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update the listeners whose data changed.
+
+        Listeners registered with a data key as context are only called
+        when the last poll changed that key, so entities of unchanged
+        fields skip their state write. Other listeners are always called,
+        and every listener is after a failed poll or when the battery
+        comes back.
+        """
+        changed, self._changed_keys = self._changed_keys, None
+        for update_callback, context in list(self._listeners.values()):
+            if changed is None or context is None or context in changed:
+                update_callback()
+
+    @property
+    def polled_after_write(self) -> bool:
+        """Return True if the cached data was requested after the last write."""
+        return self._data_sent_at >= self._last_write_at
+
+    async def async_request_refresh(self) -> None:
+        """Request a refresh, unless a queued poll already covers it.
+
+        A poll none of whose queries has been sent yet will read the
+        battery after any write that completed before, since writes
+        overtake polls in the command queue.
+        """
+        if self._polling and (
+            self._poll_sent_at is None or self._poll_sent_at >= self._last_write_at
+        ):
+            _LOGGER.debug("Skipping refresh of %s, a queued poll covers it", self.ip_address)
+            return
+        await super().async_request_refresh()
+
+    async def _async_probe(self) -> None:
+        """Send a single probe to an offline battery."""
         try:
-            # Get ES Mode data (contains all necessary information)
-            es_mode_data = await self._execute_command_with_retry(CMD_GET_MODE)
+            await self._execute_command_with_retry(CMD_GET_MODE, policy=self.probe_policy)
+        except UpdateFailed as err:
+            self.breaker.record_failure()
+            self.update_interval = timedelta(seconds=self.breaker.probe_interval)
+            raise UpdateFailed(
+                f"Battery at {self.ip_address} is offline, next probe in {self.breaker.probe_interval}s"
+            ) from err
+
+        self.breaker.record_success()
+        _LOGGER.info("Battery at %s is responding again", self.ip_address)
+
+    async def async_restore_snapshot(self) -> bool:
+        """Load the last snapshot saved for this battery.
+
+        Returns True if there was one; entities then show the last known
+        values until the first poll completes. The energy counters carry
+        on from their saved totals.
+        """
+        if self._store is None:
+            return False
+        stored = await self._store.async_load()
+        if not stored:
+            return False
+        self.energy.restore(stored.get("energy") or {})
+        if not stored.get("data"):
+            return False
+        self.data = BatteryData.from_dict(stored["data"])
+        _LOGGER.debug("Restored the last known state of %s", self.ip_address)
+        return True
 
-            # Parse the data
-            data = self._parse_data(es_mode_data)
+    @callback
+    def _async_save_snapshot(self) -> None:
+        """Schedule a write of the snapshot.
 
-            return data
+        The snapshot is written at most every SNAPSHOT_SAVE_DELAY, with
+        the data current at write time, and when Home Assistant stops.
+        """
+        if self._store is None or self._snapshot_pending:
+            return
+        self._snapshot_pending = True
+        self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
 
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with device: {err}") from err
+    async def async_shutdown(self) -> None:
+        """Cancel any scheduled refresh and write the snapshot now.
+
+        A pending delayed write would otherwise outlive the coordinator
+        and could overwrite the snapshot of the one replacing it.
+        """
+        await super().async_shutdown()
+        if self._snapshot_pending and self._store is not None:
+            await self._store.async_save(self._snapshot())
+
+    def _snapshot(self) -> dict[str, Any]:
+        """Return the snapshot to write to disk."""
+        self._snapshot_pending = False
+        return {
+            "data": self.data.as_dict() if self.data is not None else None,
+            "energy": self.energy.as_dict(),
+        }
+
+    def _check_identity(self) -> None:
+        """Make sure the battery that answered is ours.
+
+        The identity is learned from the first replies if it is not known
+        yet. When the address answers with another identity, the router
+        gave it to another battery: the replies are rejected.
+        """
+        src = self.transport.identity(self.ip_address)
+        if src is None or src == self.src:
+            self._address_taken = False
+            return
+        if self.src is None:
+            self.src = src
+            self._async_save_address()
+            return
+
+        self._address_taken = True
+        raise UpdateFailed(f"{self.ip_address} now answers as {src} instead of {self.src}")
+
+    async def _async_relocate(self) -> bool:
+        """Look for the battery at another address after sustained failures.
+
+        Only a battery with a known identity is searched for, once the
+        circuit breaker is open or another battery answers at its address,
+        and at most every RELOCATE_INTERVAL. Returns True if the battery
+        was found at a new address.
+        """
+        if self.src is None or not (self.breaker.is_open or self._address_taken):
+            return False
+        now = time.monotonic()
+        if self._located_at is not None and now - self._located_at < RELOCATE_INTERVAL:
+            return False
+        self._located_at = now
+
+        _LOGGER.debug("Looking for %s on the local network", self.src)
+        try:
+            battery = await async_locate(self.hass, self.src, self.port)
+        except OSError as err:
+            _LOGGER.debug("Could not search for %s: %s", self.src, err)
+            return False
+        if battery is None or battery.ip == self.ip_address:
+            _LOGGER.debug("%s not found at another address", self.src)
+            return False
+
+        _LOGGER.warning("Battery %s moved from %s to %s", self.src, self.ip_address, battery.ip)
+        previous = self.ip_address
+        self.ip_address = battery.ip
+        self._address_taken = False
+        self.breaker.record_success()
+        self.update_interval = timedelta(seconds=self.scan_interval)
+        self._async_save_address(previous)
+        return True
+
+    @callback
+    def _async_save_address(self, previous: str | None = None) -> None:
+        """Store the address and identity of the battery in its config entry.
+
+        The entry is updated in place; its unique id, and its title and
+        device name when they still show the previous address, follow the
+        new address.
+        """
+        entry = self.config_entry
+        if entry is None:
+            return
+
+        changes: dict[str, Any] = {
+            "data": {**entry.data, CONF_IP_ADDRESS: self.ip_address, CONF_SRC: self.src},
+        }
+        if previous is not None:
+            if self.hass.config_entries.async_entry_for_domain_unique_id(DOMAIN, self.ip_address) is None:
+                changes["unique_id"] = self.ip_address
+            old_name = f"Marstek Venus E 3.0 ({previous})"
+            new_name = f"Marstek Venus E 3.0 ({self.ip_address})"
+            if entry.title == old_name:
+                changes["title"] = new_name
+            device_registry = dr.async_get(self.hass)
+            device = device_registry.async_get_device(identifiers={(DOMAIN, entry.entry_id)})
+            if device is not None and device.name == old_name:
+                device_registry.async_update_device(device.id, name=new_name)
+
+        self.hass.config_entries.async_update_entry(entry, **changes)
+
+    def _statistics_capacity(self) -> int:
+        """Return the samples of the longest statistics window at the fastest poll rate."""
+        fastest = self.scheduler.fast_interval if self.scheduler is not None else self.scan_interval
+        return min(STATISTICS_MAX_SAMPLES, math.ceil(max(STATISTICS_WINDOWS) / fastest) + 2)
+
+    def _energy_max_gap(self) -> float:
+        """Return the longest interval between two readings worth integrating."""
+        return max(ENERGY_MAX_GAP, 2 * self.scan_interval)
+
+    def retry_policy(self, command: str) -> RetryPolicy:
+        """Return the retry policy of a command."""
+        return self.retry_policies.get(command, self.read_policy)
+
+    def _set_retry_budget(self, timeout: float, max_retries: int) -> None:
+        """Scale the retry policies to an attempt timeout and write budget."""
+        self.read_policy, write_policy, self.probe_policy = scaled_policies(timeout, max_retries)
+        self.retry_policies[CMD_SET_MODE] = write_policy
+
+    @callback
+    def async_reconfigure(
+        self,
+        port: int,
+        scan_interval: int,
+        fast_scan_interval: int | None,
+        timeout: float,
+        max_retries: int,
+        deadband: Deadband,
+    ) -> None:
+        """Apply new options to the running coordinator.
+
+        The data, the entities and the UDP endpoint are kept. Commands
+        already under way finish with the settings they started with; the
+        next poll is rescheduled at the new interval right away.
+        """
+        self.port = port
+        self._set_retry_budget(timeout, max_retries)
+        self.deadband = deadband
+
+        self.scan_interval = scan_interval
+        self.breaker.min_probe_interval = max(BREAKER_PROBE_INTERVAL, scan_interval)
+        self.breaker.max_probe_interval = max(self.breaker.max_probe_interval, self.breaker.min_probe_interval)
+        if fast_scan_interval is None:
+            self.scheduler = None
+        elif self.scheduler is None:
+            self.scheduler = AdaptivePollScheduler(fast_scan_interval, scan_interval)
+        else:
+            self.scheduler.fast_interval = fast_scan_interval
+            self.scheduler.slow_interval = max(scan_interval, fast_scan_interval)
+            self.scheduler.interval = min(
+                max(self.scheduler.interval, self.scheduler.fast_interval),
+                self.scheduler.slow_interval,
+            )
+        self.statistics.resize(self._statistics_capacity())
+        self.energy.max_gap = self._energy_max_gap()
+
+        if self.breaker.is_open:
+            self.breaker.probe_interval = max(self.breaker.probe_interval, self.breaker.min_probe_interval)
+            interval = self.breaker.probe_interval
+        elif self.scheduler is not None:
+            interval = self.scheduler.interval
+        else:
+            interval = scan_interval
+        self.update_interval = timedelta(seconds=interval)
+        if self._listeners and not self._polling:
+            # Polls reschedule themselves when they end
+            self._schedule_refresh()
+        _LOGGER.debug(
+            "Applied new options to %s: port %d, interval %ss, timeout %ss, %d attempts",
+            self.ip_address,
+            port,
+            interval,
+            timeout,
+            max_retries,
+        )
 
     async def _execute_command_with_retry(
         self,
         command: str,
         params: dict | None = None,
+        policy: RetryPolicy | None = None,
+        priority: int = PRIORITY_POLL,
+        write_key: str | None = None,
     ) -> dict[str, Any]:
-        """Execute a command with retry mechanism (inspired by Jeedom script)."""
+        """Execute a command with retry mechanism (inspired by Jeedom script).
+
+        Every attempt waits for a slot in the command queue at the given
+        priority. write_key identifies a write that can still be superseded
+        until its first attempt gets a slot (see _async_write).
+        """
         if params is None:
             params = {"id": 0}
+        if policy is None:
+            policy = self.retry_policy(command)
 
-        request = {
-            "id": 1,
-            "method": command,
-            "params": params,
-        }
+        # Requests of earlier attempts stay in flight so that a late reply
+        # can still complete the command
+        in_flight: dict[int, asyncio.Future] = {}
+        try:
+            return await self._run_attempts(command, params, in_flight, policy, priority, write_key)
+        finally:
+            for request_id in in_flight:
+                self.transport.cancel_request(self.ip_address, request_id)
 
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                # Progressive timeout: base + (attempt - 1) seconds
-                timeout = self.timeout + (attempt - 1)
+    async def _run_attempts(
+        self,
+        command: str,
+        params: dict[str, Any],
+        in_flight: dict[int, asyncio.Future],
+        policy: RetryPolicy,
+        priority: int,
+        write_key: str | None,
+    ) -> dict[str, Any]:
+        """Run the retry ladder of a command within the policy deadline."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline
+        last_error: Exception | None = None
+        attempt = 0
+        metrics = self.metrics.command(command)
+        # Probes of an offline battery are expected to fail; keep the log quiet
+        log_failure = _LOGGER.debug if self.breaker.is_open else _LOGGER.warning
+
+        while attempt < policy.max_attempts:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            attempt += 1
+            if attempt > 1:
+                metrics.retries += 1
 
-                _LOGGER.debug(
-                    "Sending command %s (attempt %d/%d, timeout=%ds)",
-                    command,
+            try:
+                async with self.queue.slot(priority):
+                    if attempt == 1 and write_key is not None:
+                        # From now on newer writes to the target queue behind this one
+                        self._pending_writes.pop(write_key, None)
+                    if priority == PRIORITY_POLL and self._poll_sent_at is None:
+                        self._poll_sent_at = loop.time()
+
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError(f"Deadline reached while {command} was queued")
+                    timeout = min(policy.attempt_timeout, remaining)
+
+                    _LOGGER.debug(
+                        "Sending command %s (attempt %d/%d, timeout=%.1fs)",
+                        command,
+                        attempt,
+                        policy.max_attempts,
+                        timeout,
+                    )
+                    response = await self._send_udp_command(command, params, in_flight, timeout)
+            except asyncio.TimeoutError as err:
+                metrics.timeouts += 1
+                log_failure(
+                    "Timeout on attempt %d/%d: %s",
                     attempt,
-                    self.max_retries,
-                    timeout,
+                    policy.max_attempts,
+                    err,
                 )
-
-                response = await self._send_udp_command(request, timeout)
-
-                # Check for parse errors that require retry
-                if isinstance(response, dict) and response.get("error"):
-                    error_code = response["error"].get("code", 0)
-                    if error_code == -32700:  # Parse error
-                        _LOGGER.warning(
-                            "Parse error on attempt %d/%d, retrying...",
-                            attempt,
-                            self.max_retries,
-                        )
-                        if attempt < self.max_retries:
-                            # Exponential backoff: 2^attempt seconds
-                            await asyncio.sleep(2 ** attempt)
-                            continue
-
+                last_error = err
+            except Exception as err:
+                if isinstance(err, ValueError):
+                    # Undecodable reply
+                    metrics.parse_errors += 1
+                    self.pacer.record_error()
+                _LOGGER.error("Unexpected error on attempt %d/%d: %s", attempt, policy.max_attempts, err)
+                last_error = err
+            else:
                 # Valid response with result
                 if isinstance(response, dict) and "result" in response:
                     _LOGGER.debug("Command %s successful on attempt %d", command, attempt)
+                    self.pacer.record_success()
                     return response
 
-                # If we're here, response is invalid but not a parse error
-                if attempt < self.max_retries:
+                if isinstance(response, dict) and response.get("error"):
+                    error = response["error"]
+                    # Parse errors (-32700) come from the firmware dropping
+                    # requests under load and are worth retrying; any other
+                    # error is the device's final answer
+                    if error.get("code", 0) != -32700:
+                        raise UpdateFailed(
+                            f"Command {command} rejected: {error.get('message', error)}"
+                        )
+                    metrics.parse_errors += 1
+                    self.pacer.record_error()
+                    _LOGGER.warning(
+                        "Parse error on attempt %d/%d, retrying...",
+                        attempt,
+                        policy.max_attempts,
+                    )
+                else:
                     _LOGGER.warning(
                         "Invalid response on attempt %d/%d, retrying...",
                         attempt,
-                        self.max_retries,
+                        policy.max_attempts,
                     )
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-
-            except (socket.timeout, asyncio.TimeoutError) as err:
-                _LOGGER.warning(
-                    "Timeout on attempt %d/%d: %s",
-                    attempt,
-                    self.max_retries,
-                    err,
-                )
-                if attempt < self.max_retries:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                raise UpdateFailed(f"Command {command} failed after {self.max_retries} attempts") from err
 
-            except Exception as err:
-                _LOGGER.error("Unexpected error on attempt %d/%d: %s", attempt, self.max_retries, err)
-                if attempt < self.max_retries:
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                raise UpdateFailed(f"Command {command} failed: {err}") from err
+            if attempt < policy.max_attempts:
+                delay = min(policy.backoff(attempt), deadline - loop.time())
+                if delay > 0:
+                    await self._async_backoff(delay)
 
-        raise UpdateFailed(f"Command {command} failed after {self.max_retries} attempts")
+        raise UpdateFailed(
+            f"Command {command} failed after {attempt} attempts"
+        ) from last_error
 
-    async def _send_udp_command(
+    async def async_send_once(
         self,
-        request: dict[str, Any],
+        command: str,
+        params: dict[str, Any],
         timeout: float,
     ) -> dict[str, Any]:
-        """Send UDP command and get response."""
-        loop = asyncio.get_event_loop()
+        """Send a command once, at control priority, without retry or backoff.
 
-        def _send_and_receive():
-            """Send and receive UDP data (blocking operation)."""
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        Used by the zero-export loop, where the next step replaces a lost
+        request sooner than a retry would.
+        """
+        in_flight: dict[int, asyncio.Future] = {}
+        try:
+            async with self.queue.slot(PRIORITY_CONTROL):
+                response = await self._send_udp_command(command, params, in_flight, timeout)
+        except asyncio.TimeoutError:
+            self.metrics.command(command).timeouts += 1
+            raise
+        finally:
+            for request_id in in_flight:
+                self.transport.cancel_request(self.ip_address, request_id)
+
+        if "result" in response:
+            self.pacer.record_success()
+        elif response.get("error", {}).get("code") == -32700:
+            self.metrics.command(command).parse_errors += 1
+            self.pacer.record_error()
+        return response
+
+    async def _async_write(
+        self,
+        key: str,
+        params: dict[str, Any],
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Send an ES.SetMode write, collapsing superseded writes.
+
+        key names what the write sets (e.g. the mode, or one Manual slot).
+        While a write to the same key is still waiting for its first slot
+        in the queue, it is sent with these params instead and both callers
+        share its reply. If the caller that sends it is cancelled, the
+        collapsed callers send their write themselves. Returns the reply
+        and the params actually sent.
+        """
+        pending = self._pending_writes.get(key)
+        if pending is not None:
+            _LOGGER.debug("Write %s superseded before it was sent", key)
+            pending.params.clear()
+            pending.params.update(params)
             try:
-                # Bind to an ephemeral port (0 = let OS choose a free port)
-                # This avoids conflicts if port 30000 is already in use locally
-                sock.bind(("0.0.0.0", 0))
-                sock.settimeout(timeout)
-
-                # Get the actual port assigned by the OS
-                local_port = sock.getsockname()[1]
-                _LOGGER.debug("Bound to local port %d for receiving responses", local_port)
-
-                # Send request (use separators for compact JSON like Jeedom script)
-                message = json.dumps(request, separators=(",", ":")).encode("utf-8")
-                _LOGGER.debug("Sending UDP request to %s:%d: %s", self.ip_address, self.port, message.decode("utf-8"))
-                sock.sendto(message, (self.ip_address, self.port))
-
-                # Receive response with better error handling
-                try:
-                    data, addr = sock.recvfrom(65535)
-                    _LOGGER.debug("Received UDP response from %s: %s", addr, data.decode("utf-8"))
-                    response = json.loads(data.decode("utf-8", errors="strict"))
-                    return response
-                except socket.timeout as err:
-                    _LOGGER.error("UDP socket timeout while waiting for response from %s:%d", self.ip_address, self.port)
-                    raise
-                except json.JSONDecodeError as err:
-                    _LOGGER.error("Failed to decode JSON response: %s", err)
-                    raise
-                except Exception as err:
-                    _LOGGER.error("Error receiving UDP response: %s", err)
+                return await asyncio.shield(pending.future), pending.params
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not pending.future.cancelled() or (task is not None and task.cancelling()):
                     raise
+            # Waiters wake up in arrival order, so the latest params win again
+            return await self._async_write(key, params)
 
-            except OSError as err:
-                _LOGGER.error("UDP socket error (port %d may be in use): %s", self.port, err)
-                raise
-            finally:
-                sock.close()
-
-        # Run blocking operation in executor
-        return await loop.run_in_executor(None, _send_and_receive)
+        pending = _PendingWrite(dict(params), asyncio.get_running_loop().create_future())
+        self._pending_writes[key] = pending
+        try:
+            response = await self._execute_command_with_retry(
+                CMD_SET_MODE,
+                pending.params,
+                priority=PRIORITY_CONTROL,
+                write_key=key,
+            )
+        except Exception as err:
+            pending.future.set_exception(err)
+            # Only callers that were collapsed into this write read it
+            pending.future.exception()
+            raise
+        except BaseException:
+            # Cancelled: the collapsed callers send their own write
+            pending.future.cancel()
+            raise
+        else:
+            pending.future.set_result(response)
+            return response, pending.params
+        finally:
+            if self._pending_writes.get(key) is pending:
+                del self._pending_writes[key]
+            self._last_write_at = asyncio.get_running_loop().time()
+
+    async def _async_backoff(self, delay: float) -> None:
+        """Wait before the next attempt."""
+        await asyncio.sleep(delay)
+
+    async def async_connect(self) -> None:
+        """Open the UDP endpoint used to talk to the battery."""
+        await self.transport.async_open()
+
+    async def async_disconnect(self) -> None:
+        """Close the UDP endpoint if this coordinator owns it."""
+        if self._owns_transport:
+            self.transport.close()
 
-    def _parse_data(
+    async def _send_udp_command(
         self,
-        es_mode_data: dict[str, Any],
+        command: str,
+        params: dict[str, Any],
+        in_flight: dict[int, asyncio.Future],
+        timeout: float,
     ) -> dict[str, Any]:
-        """Parse the response data into sensor values.
-
-        The battery returns all data in ES.GetMode response with this format:
-        {
-            "id": 1,
-            "src": "VenusE 3.0-009b08a5e322",
-            "result": {
-                "id": 0,
-                "mode": "Auto",  # String: "Auto", "AI", "Manual", "Passive"
-                "ongrid_power": 437,
-                "offgrid_power": 0,
-                "bat_soc": 81,  # State of Charge in %
-                "ct_state": 0,
-                "a_power": 0,
-                "b_power": 0,
-                "c_power": 0,
-                "total_power": 0,
-                "input_energy": 0,
-                "output_energy": 0
-            }
-        }
-        """
-        data = {}
-
-        if "result" in es_mode_data:
-            result = es_mode_data["result"]
+        """Send UDP command and get response.
 
-            # Mode (string format: "Auto", "AI", "Manual", "Passive")
-            mode_str = result.get("mode", "Unknown")
-            data["es_mode"] = mode_str
-
-            # Battery data
-            data["soc"] = result.get("bat_soc", 0)
-
-            # Power data
-            data["ongrid_power"] = result.get("ongrid_power", 0)
-            data["offgrid_power"] = result.get("offgrid_power", 0)
-
-            # Phase powers
-            data["a_power"] = result.get("a_power", 0)
-            data["b_power"] = result.get("b_power", 0)
-            data["c_power"] = result.get("c_power", 0)
-            data["total_power"] = result.get("total_power", 0)
+        A new request is only sent when no earlier attempt has been answered
+        in the meantime, and once the pacer allows it. The first reply to any
+        request in in_flight wins.
+        """
+        if not any(future.done() for future in in_flight.values()):
+            await self.pacer.async_acquire()
+            request_id, future = self.transport.send_request(
+                self.ip_address,
+                self.port,
+                command,
+                params,
+                self.metrics,
+            )
+            in_flight[request_id] = future
 
-            # Energy counters
-            data["input_energy"] = result.get("input_energy", 0)
-            data["output_energy"] = result.get("output_energy", 0)
+        done, _ = await asyncio.wait(
+            list(in_flight.values()),
+            timeout=timeout,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+            raise asyncio.TimeoutError(
+                f"No response from {self.ip_address}:{self.port} within {timeout}s"
+            )
 
-        return data
+        request_id = next(rid for rid, future in in_flight.items() if future in done)
+        future = in_flight.pop(request_id)
+        self.transport.cancel_request(self.ip_address, request_id)
+        return future.result()
 
     async def async_set_mode(
         self,
@@ -265,7 +769,10 @@ class MarstekVenusE3Coordinator(DataUpdateCoordinator):
             enable: Enable flag for Manual mode (0=disabled, 1=enabled)
             time_num: Time period serial number (0-9) for Manual mode
             cd_time: Duration in seconds for Passive mode (cmd_time)
+
+        A running zero-export loop is stopped first.
         """
+        await self.async_stop_zero_export()
         try:
             # For Manual mode (mode=2), we need to send manual_cfg
             if mode == 2:
@@ -273,32 +780,21 @@ class MarstekVenusE3Coordinator(DataUpdateCoordinator):
                     _LOGGER.error("Manual mode requires start_time and end_time")
                     return False
 
-                params = {
-                    "id": 0,
-                    "config": {
-                        "mode": "Manual",
-                        "manual_cfg": {
-                            "time_num": time_num,
-                            "start_time": start_time,
-                            "end_time": end_time,
-                            "week_set": week_set,
-                            "power": power,
-                            "enable": enable,
-                        }
-                    }
+                manual_cfg = {
+                    "time_num": time_num,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "week_set": week_set,
+                    "power": power,
+                    "enable": enable,
                 }
+                params = self._manual_mode_params(manual_cfg)
             elif mode == 3:  # Passive mode
                 # For Passive mode, we need to send passive_cfg with power and cd_time
-                params = {
-                    "id": 0,
-                    "config": {
-                        "mode": "Passive",
-                        "passive_cfg": {
-                            "power": power,
-                            "cd_time": cd_time if cd_time is not None else 300,  # Default 300 seconds
-                        }
-                    }
-                }
+                params = self.passive_mode_params(
+                    power,
+                    cd_time if cd_time is not None else 300,  # Default 300 seconds
+                )
             else:
                 # For Auto and AI modes, just send the mode
                 params = {
@@ -306,13 +802,148 @@ class MarstekVenusE3Coordinator(DataUpdateCoordinator):
                     "mode": mode,
                 }
 
-            response = await self._execute_command_with_retry(
-                "ES.SetMode",
-                params=params,
-            )
+            # Auto, AI and Passive replace each other; Manual slots are independent
+            key = f"manual_{time_num}" if mode == 2 else "mode"
+            response, sent = await self._async_write(key, params)
+            success = self.set_mode_succeeded(response)
+
+            if mode == 2:
+                if success:
+                    self.manual_slots[time_num] = sent["config"]["manual_cfg"]
+                else:
+                    self.manual_slots.pop(time_num, None)
+
+            if success:
+                self._boost_scheduler()
 
-            return "result" in response and response["result"].get("success", False)
+            return success
 
         except Exception as err:
+            if mode == 2:
+                self.manual_slots.pop(time_num, None)
             _LOGGER.error("Failed to set mode: %s", err)
             return False
+
+    async def async_set_schedule(
+        self,
+        slots: list[dict[str, Any]],
+        force: bool = False,
+    ) -> bool:
+        """Program several Manual mode slots at once.
+
+        Each slot is a manual_cfg dict (time_num, start_time, end_time,
+        week_set, power, enable). Only the slots that differ from what was
+        last written to the battery are sent, unless force is set; they are
+        queued together and sent as fast as the command queue allows.
+        Returns True if every write succeeded.
+
+        A running zero-export loop is stopped first.
+        """
+        await self.async_stop_zero_export()
+        changed = self.schedule_changes(slots, force)
+        _LOGGER.debug(
+            "Writing %d of %d schedule slots to %s",
+            len(changed),
+            len(slots),
+            self.ip_address,
+        )
+        if not changed:
+            return True
+
+        results = await asyncio.gather(
+            *(
+                self._async_write(
+                    f"manual_{slot['time_num']}",
+                    self._manual_mode_params(dict(slot)),
+                )
+                for slot in changed
+            ),
+            return_exceptions=True,
+        )
+
+        success = True
+        for slot, result in zip(changed, results):
+            if not isinstance(result, BaseException):
+                response, sent = result
+                if self.set_mode_succeeded(response):
+                    self.manual_slots[slot["time_num"]] = sent["config"]["manual_cfg"]
+                    continue
+                result = response
+            # The slot is in an unknown state; write it again next time
+            self.manual_slots.pop(slot["time_num"], None)
+            success = False
+            _LOGGER.error("Failed to write schedule slot %d: %s", slot["time_num"], result)
+
+        if success:
+            self._boost_scheduler()
+        return success
+
+    def schedule_changes(
+        self,
+        slots: list[dict[str, Any]],
+        force: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Return the slots that differ from what was last written."""
+        return [
+            slot for slot in slots
+            if force or self.manual_slots.get(slot["time_num"]) != slot
+        ]
+
+    async def async_start_zero_export(self, **settings: Any) -> None:
+        """Start the zero-export loop, replacing a running one.
+
+        settings are passed to ZeroExportController (target, max_power,
+        interval, cd_time...).
+        """
+        await self.async_stop_zero_export()
+        self.zero_export = ZeroExportController(self, **settings)
+        self.zero_export.start()
+        _LOGGER.info("Zero-export loop started for %s", self.ip_address)
+
+    async def async_stop_zero_export(self) -> None:
+        """Stop the zero-export loop if it runs."""
+        if self.zero_export is None:
+            return
+        await self.zero_export.async_stop()
+        self.zero_export = None
+        _LOGGER.info("Zero-export loop stopped for %s", self.ip_address)
+
+    @staticmethod
+    def _manual_mode_params(manual_cfg: dict[str, Any]) -> dict[str, Any]:
+        """Return the ES.SetMode params programming one Manual mode slot."""
+        return {
+            "id": 0,
+            "config": {
+                "mode": "Manual",
+                "manual_cfg": manual_cfg,
+            }
+        }
+
+    @staticmethod
+    def passive_mode_params(power: int, cd_time: int) -> dict[str, Any]:
+        """Return the ES.SetMode params of a Passive mode setpoint."""
+        return {
+            "id": 0,
+            "config": {
+                "mode": "Passive",
+                "passive_cfg": {
+                    "power": power,
+                    "cd_time": cd_time,
+                }
+            }
+        }
+
+    @staticmethod
+    def set_mode_succeeded(response: dict[str, Any]) -> bool:
+        """Return True if an ES.SetMode reply reports success."""
+        if "result" not in response:
+            return False
+        # The Open API reports "set_result"; older firmware used "success"
+        result = response["result"]
+        return bool(result.get("set_result", result.get("success", False)))
+
+    def _boost_scheduler(self) -> None:
+        """Follow the transition after a mode change closely."""
+        if self.scheduler is not None:
+            interval = self.scheduler.boost(time.monotonic())
+            self.update_interval = timedelta(seconds=interval)
@@ -0,0 +1,42 @@
+"""Publication deadband of noisy Marstek Venus E 3.0 readings."""
+from dataclasses import dataclass
+
+from .const import (
+    DEFAULT_POWER_DEADBAND,
+    DEFAULT_POWER_DEADBAND_PERCENT,
+    DEFAULT_POWER_HEARTBEAT,
+)
+
+
+@dataclass(frozen=True)
+class Deadband:
+    """Hysteresis applied before a reading is published as a new state.
+
+    A reading is published when it moved away from the last published
+    value by at least absolute (in the unit of the reading) or percent of
+    the published value, whichever band is wider. A reading that changed
+    but stayed within the band is still published once heartbeat seconds
+    have passed since the last publication, and a reading reaching or
+    leaving zero always is. A band of zero disables the deadband.
+    """
+
+    absolute: float = DEFAULT_POWER_DEADBAND
+    percent: float = DEFAULT_POWER_DEADBAND_PERCENT
+    heartbeat: float = DEFAULT_POWER_HEARTBEAT
+
+    @property
+    def enabled(self) -> bool:
+        """Return True if readings are filtered at all."""
+        return self.absolute > 0 or self.percent > 0
+
+    def should_publish(self, value: float, published: float, elapsed: float) -> bool:
+        """Return True if value must replace the published value.
+
+        elapsed is the time since published was published, in seconds.
+        """
+        if value == published:
+            return False
+        if (value == 0) != (published == 0) or elapsed >= self.heartbeat:
+            return True
+        band = max(self.absolute, abs(published) * self.percent / 100)
+        return abs(value - published) >= band
@@ -0,0 +1,223 @@
+"""Discovery of Marstek Venus E 3.0 batteries on the local network."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from dataclasses import dataclass
+import ipaddress
+import json
+import logging
+from typing import Any
+
+from homeassistant.components import network
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    CMD_GET_DEVICE,
+    DISCOVERY_BROADCAST_WAIT,
+    DISCOVERY_CONNECT_ATTEMPTS,
+    DISCOVERY_CONNECT_TIMEOUT,
+    DISCOVERY_MAX_HOSTS,
+    DISCOVERY_PROBE_BURST,
+    DISCOVERY_PROBE_GAP,
+    DISCOVERY_PROBE_WAIT,
+)
+from .pacer import RequestPacer
+
+_LOGGER = logging.getLogger(__name__)
+
+# The device query of the Open API; every battery answers it
+DISCOVERY_REQUEST = json.dumps(
+    {"id": 0, "method": CMD_GET_DEVICE, "params": {"ble_mac": "0"}},
+    separators=(",", ":"),
+).encode("utf-8")
+
+
+@dataclass(frozen=True)
+class DiscoveredBattery:
+    """A battery that answered the device query."""
+
+    src: str
+    ip: str
+    device: str | None = None
+    firmware: int | None = None
+    wifi_mac: str | None = None
+
+    @property
+    def label(self) -> str:
+        """Return the name shown when picking the battery."""
+        return f"{self.src} ({self.ip})"
+
+
+class _DiscoveryProtocol(asyncio.DatagramProtocol):
+    """Collect device query replies from any address."""
+
+    def __init__(
+        self,
+        pacer: RequestPacer,
+        expected: int | None,
+        wanted: str | None,
+    ) -> None:
+        """Initialize the protocol."""
+        self.found: dict[str, DiscoveredBattery] = {}
+        self.complete = asyncio.Event()
+        self._pacer = pacer
+        self._expected = expected
+        self._wanted = wanted
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Record a battery from its reply."""
+        try:
+            response = json.loads(data.decode("utf-8"))
+        except ValueError:
+            _LOGGER.debug("Ignoring undecodable discovery reply from %s", addr)
+            return
+        if not isinstance(response, dict):
+            return
+
+        error = response.get("error")
+        if isinstance(error, dict) and error.get("code") == -32700:
+            # The battery is there but overloaded; slow the sweep down
+            self._pacer.record_error()
+            return
+
+        result = response.get("result")
+        if not isinstance(result, dict):
+            return
+        src = response.get("src")
+        if not isinstance(src, str):
+            # Older firmware may not report its identity
+            src = f"{result.get('device', 'VenusE')}-{result.get('wifi_mac') or addr[0]}"
+
+        _LOGGER.debug("Discovered %s at %s", src, addr[0])
+        self.found[src] = DiscoveredBattery(
+            src=src,
+            ip=addr[0],
+            device=result.get("device"),
+            firmware=result.get("ver"),
+            wifi_mac=result.get("wifi_mac"),
+        )
+        if src == self._wanted or (
+            self._expected is not None and len(self.found) >= self._expected
+        ):
+            self.complete.set()
+
+    def error_received(self, exc: Exception) -> None:
+        """Ignore socket level errors (e.g. ICMP port unreachable)."""
+        _LOGGER.debug("UDP error during discovery: %s", exc)
+
+
+async def async_scan(
+    targets: Iterable[str],
+    port: int,
+    wait: float,
+    expected: int | None = None,
+    wanted: str | None = None,
+) -> dict[str, DiscoveredBattery]:
+    """Send the device query to every target and collect the replies.
+
+    Targets may be host or broadcast addresses. Queries go out through a
+    request pacer: a burst first, then one every DISCOVERY_PROBE_GAP,
+    slowed down further if a battery answers -32700. Replies are collected
+    until wait seconds after the last query, or until expected batteries
+    or the battery with the wanted src identity have answered. Returns the
+    batteries found, keyed by src identity; none if the query socket
+    cannot be opened.
+    """
+    loop = asyncio.get_running_loop()
+    pacer = RequestPacer(burst=DISCOVERY_PROBE_BURST)
+    pacer.gap = DISCOVERY_PROBE_GAP
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _DiscoveryProtocol(pacer, expected, wanted),
+            local_addr=("0.0.0.0", 0),
+            allow_broadcast=True,
+        )
+    except OSError as err:
+        _LOGGER.debug("Could not open the discovery socket: %s", err)
+        return {}
+    try:
+        for target in targets:
+            if protocol.complete.is_set():
+                break
+            await pacer.async_acquire()
+            try:
+                transport.sendto(DISCOVERY_REQUEST, (target, port))
+            except OSError as err:
+                _LOGGER.debug("Could not send the device query to %s: %s", target, err)
+        try:
+            await asyncio.wait_for(protocol.complete.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        transport.close()
+    return protocol.found
+
+
+async def async_discover(hass: HomeAssistant, port: int) -> dict[str, DiscoveredBattery]:
+    """Find the batteries on the local networks.
+
+    The device query is broadcast on every enabled interface first. When
+    no battery answers (broadcasts are often filtered by access points),
+    every host of the local IPv4 networks is probed instead.
+    """
+    found = await async_scan(await _async_broadcast_addresses(hass), port, DISCOVERY_BROADCAST_WAIT)
+    if found:
+        return found
+
+    hosts = await _async_local_hosts(hass)
+    _LOGGER.debug("No reply to the broadcast query, probing %d hosts", len(hosts))
+    return await async_scan(hosts, port, DISCOVERY_PROBE_WAIT)
+
+
+async def async_locate(hass: HomeAssistant, src: str, port: int) -> DiscoveredBattery | None:
+    """Find the battery with the given src identity on the local networks.
+
+    Like async_discover, but the local networks are also probed when other
+    batteries answer the broadcast, and each scan stops as soon as the
+    battery is found.
+    """
+    found = await async_scan(
+        await _async_broadcast_addresses(hass), port, DISCOVERY_BROADCAST_WAIT, wanted=src
+    )
+    if src not in found:
+        found = await async_scan(await _async_local_hosts(hass), port, DISCOVERY_PROBE_WAIT, wanted=src)
+    return found.get(src)
+
+
+async def async_probe_host(host: str, port: int) -> DiscoveredBattery | None:
+    """Return the battery answering at host, or None if there is none."""
+    for _ in range(DISCOVERY_CONNECT_ATTEMPTS):
+        found = await async_scan([host], port, DISCOVERY_CONNECT_TIMEOUT, expected=1)
+        if found:
+            return next(iter(found.values()))
+    return None
+
+
+async def _async_broadcast_addresses(hass: HomeAssistant) -> list[str]:
+    """Return the IPv4 broadcast addresses of the enabled interfaces."""
+    return [str(address) for address in await network.async_get_ipv4_broadcast_addresses(hass)]
+
+
+async def _async_local_hosts(hass: HomeAssistant) -> list[str]:
+    """Return the addresses of the local IPv4 networks, except our own."""
+    hosts: dict[str, None] = {}
+    for adapter in await network.async_get_adapters(hass):
+        if not adapter["enabled"]:
+            continue
+        for ip_info in adapter["ipv4"]:
+            interface = _interface(ip_info)
+            if interface.ip.is_loopback:
+                continue
+            subnet = interface.network
+            if subnet.num_addresses > DISCOVERY_MAX_HOSTS:
+                subnet = ipaddress.ip_interface(f"{interface.ip}/24").network
+            for host in subnet.hosts():
+                if host != interface.ip:
+                    hosts[str(host)] = None
+    return list(hosts)
+
+
+def _interface(ip_info: dict[str, Any]) -> ipaddress.IPv4Interface:
+    """Return the interface of a network adapter address."""
+    return ipaddress.IPv4Interface(f"{ip_info['address']}/{ip_info['network_prefix']}")
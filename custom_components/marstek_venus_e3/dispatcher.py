@@ -0,0 +1,270 @@
+"""Fleet power dispatcher for Marstek Venus E 3.0."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    DISPATCH_CD_TIME,
+    DISPATCH_DEADBAND,
+    DISPATCH_MAX_SOC,
+    DISPATCH_MIN_SOC,
+    MAX_POWER,
+)
+
+if TYPE_CHECKING:
+    from .coordinator import MarstekVenusE3Coordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _Unit:
+    """Dispatch state of one battery."""
+
+    __slots__ = ("coordinator", "weight", "share", "written", "written_at", "unsubscribe")
+
+    def __init__(self, coordinator: MarstekVenusE3Coordinator) -> None:
+        """Initialize the unit."""
+        self.coordinator = coordinator
+        self.weight = 0
+        self.share = 0
+        self.written: int | None = None
+        self.written_at = 0.0
+        self.unsubscribe: Callable[[], None] | None = None
+
+
+class FleetDispatcher:
+    """Split a site power setpoint across several batteries.
+
+    The target (positive = discharge, negative = charge) is shared in
+    proportion to the energy each battery can give: its SOC above
+    DISPATCH_MIN_SOC when discharging, its room below DISPATCH_MAX_SOC
+    when charging. No battery is asked for more than max_power; what a
+    saturated battery cannot take is spread over the others.
+
+    Each battery is driven in Passive mode. The split is updated from the
+    cached poll data every time a battery is polled: only that battery's
+    weight changes, and only the batteries whose share moved by at least
+    deadband, that left Passive mode, or whose cd_time countdown is half
+    gone are written again, concurrently.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        cd_time: int = DISPATCH_CD_TIME,
+        deadband: int = DISPATCH_DEADBAND,
+        max_power: int = MAX_POWER,
+    ) -> None:
+        """Initialize the dispatcher."""
+        self.hass = hass
+        self.cd_time = cd_time
+        self.deadband = deadband
+        self.max_power = max_power
+        self.target = 0
+        self._units: dict[str, _Unit] = {}
+        self._weight_total = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._dirty = False
+
+    @property
+    def shares(self) -> dict[str, int]:
+        """Return the current share of each device, in W."""
+        return {device_id: unit.share for device_id, unit in self._units.items()}
+
+    async def async_dispatch(
+        self,
+        target: int,
+        coordinators: dict[str, MarstekVenusE3Coordinator],
+        cd_time: int | None = None,
+    ) -> dict[str, dict[str, Any]]:
+        """Dispatch a site target over the given batteries, keyed by device id.
+
+        Batteries dispatched before but missing from coordinators are
+        released. Returns the share and write outcome of each battery.
+        """
+        self.target = target
+        if cd_time is not None:
+            self.cd_time = cd_time
+
+        for device_id in [device_id for device_id in self._units if device_id not in coordinators]:
+            self._release(device_id)
+        for device_id, coordinator in coordinators.items():
+            unit = self._units.get(device_id)
+            if unit is None or unit.coordinator is not coordinator:
+                if unit is not None:
+                    self._release(device_id)
+                unit = self._units[device_id] = _Unit(coordinator)
+                unit.unsubscribe = coordinator.async_add_listener(
+                    lambda device_id=device_id: self._async_handle_update(device_id)
+                )
+
+        # The target may have changed direction: weigh every battery again
+        self._weight_total = 0
+        for unit in self._units.values():
+            unit.weight = self._weight(unit.coordinator)
+            self._weight_total += unit.weight
+
+        results = await self.async_rebalance()
+        return {
+            device_id: {
+                "success": results.get(device_id, True),
+                "power": unit.share,
+                "soc": (unit.coordinator.data or {}).get("soc"),
+            }
+            for device_id, unit in self._units.items()
+        }
+
+    async def async_stop(self) -> None:
+        """Stop dispatching.
+
+        The last setpoints stay active until their cd_time runs out.
+        """
+        for device_id in list(self._units):
+            self._release(device_id)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def remove(self, coordinator: MarstekVenusE3Coordinator) -> None:
+        """Stop dispatching to a battery; the others share its part."""
+        for device_id in [
+            device_id for device_id, unit in self._units.items() if unit.coordinator is coordinator
+        ]:
+            self._release(device_id)
+        if self._units:
+            self._async_schedule_rebalance()
+
+    async def async_rebalance(self) -> dict[str, bool]:
+        """Write the shares that changed; return the outcome of each write."""
+        async with self._lock:
+            if not self._units:
+                return {}
+            shares = self._split()
+            now = time.monotonic()
+
+            writes = []
+            for device_id, unit in self._units.items():
+                unit.share = shares[device_id]
+                if self._needs_write(unit, now):
+                    writes.append(device_id)
+            if not writes:
+                return {}
+
+            _LOGGER.debug(
+                "Dispatching %d W: writing %s",
+                self.target,
+                {device_id: shares[device_id] for device_id in writes},
+            )
+            results = await asyncio.gather(
+                *(
+                    self._units[device_id].coordinator.async_set_mode(
+                        mode=3, power=shares[device_id], cd_time=self.cd_time
+                    )
+                    for device_id in writes
+                )
+            )
+
+            outcome = {}
+            for device_id, success in zip(writes, results):
+                outcome[device_id] = success
+                unit = self._units.get(device_id)
+                if unit is None:
+                    # Released while the write was under way
+                    continue
+                if success:
+                    unit.written = shares[device_id]
+                    unit.written_at = now
+                else:
+                    # Unknown setpoint; write it again on the next poll
+                    unit.written = None
+            return outcome
+
+    def _split(self) -> dict[str, int]:
+        """Split the target in proportion to the weights, within max_power."""
+        shares = dict.fromkeys(self._units, 0)
+        free = {device_id: unit.weight for device_id, unit in self._units.items() if unit.weight > 0}
+        total = self._weight_total
+        remaining = self.target
+        while free and total > 0:
+            saturated = [
+                device_id for device_id, weight in free.items()
+                if abs(remaining) * weight >= self.max_power * total
+            ]
+            if not saturated:
+                for device_id, weight in free.items():
+                    shares[device_id] = round(remaining * weight / total)
+                break
+            # Saturated batteries take max_power; the rest is split again
+            for device_id in saturated:
+                shares[device_id] = self.max_power if remaining > 0 else -self.max_power
+                remaining -= shares[device_id]
+                total -= free.pop(device_id)
+        return shares
+
+    def _needs_write(self, unit: _Unit, now: float) -> bool:
+        """Return True if the share of a battery must be written."""
+        if unit.written is None or abs(unit.share - unit.written) >= self.deadband:
+            return True
+        if now - unit.written_at >= self.cd_time / 2:
+            return True
+        # Switched to another mode behind our back, as seen by a poll sent
+        # after our write
+        if not unit.coordinator.polled_after_write:
+            return False
+        mode = (unit.coordinator.data or {}).get("es_mode")
+        return mode is not None and mode != "Passive"
+
+    def _weight(self, coordinator: MarstekVenusE3Coordinator) -> int:
+        """Return the weight of a battery from its cached SOC."""
+        soc = (coordinator.data or {}).get("soc")
+        if soc is None:
+            return 0
+        if self.target >= 0:
+            return max(0, soc - DISPATCH_MIN_SOC)
+        return max(0, DISPATCH_MAX_SOC - soc)
+
+    @callback
+    def _async_handle_update(self, device_id: str) -> None:
+        """Update the weight of a freshly polled battery."""
+        unit = self._units.get(device_id)
+        if unit is None:
+            return
+        weight = self._weight(unit.coordinator)
+        self._weight_total += weight - unit.weight
+        unit.weight = weight
+        self._async_schedule_rebalance()
+
+    @callback
+    def _async_schedule_rebalance(self) -> None:
+        """Rebalance soon; polls arriving meanwhile share the run."""
+        self._dirty = True
+        if self._task is not None and not self._task.done():
+            return
+        self._task = self.hass.async_create_background_task(
+            self._async_scheduled_rebalance(),
+            "marstek_venus_e3 dispatch",
+        )
+
+    async def _async_scheduled_rebalance(self) -> None:
+        """Run a rebalance scheduled by a poll."""
+        # Let the other polls of the same round land first
+        await asyncio.sleep(0)
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self.async_rebalance()
+            except Exception as err:  # pylint: disable=broad-except
+                _LOGGER.debug("Dispatch rebalance failed: %s", err)
+
+    def _release(self, device_id: str) -> None:
+        """Forget a battery."""
+        unit = self._units.pop(device_id)
+        self._weight_total -= unit.weight
+        if unit.unsubscribe is not None:
+            unit.unsubscribe()
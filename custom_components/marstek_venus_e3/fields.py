@@ -0,0 +1,352 @@
+"""Fields read from the Marstek Venus E 3.0 status queries.
+
+FIELDS is the single place describing a reading: where it comes from in
+the poll replies, how it is converted and, when it has a sensor, how the
+sensor looks. The decoding table, the BatteryData slots and the sensor
+descriptions are all built from it. ENERGY_COUNTERS lists the energy
+integrated from the power fields.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfPower, UnitOfTemperature
+
+from .const import (
+    CMD_GET_BAT_STATUS,
+    CMD_GET_EM_STATUS,
+    CMD_GET_ES_STATUS,
+    CMD_GET_MODE,
+    CMD_GET_PV_STATUS,
+)
+
+
+@dataclass(frozen=True)
+class Field:
+    """A reading and the replies it is taken from.
+
+    sources lists (command, path) pairs, most trusted first: the value is
+    read from the first command that answered the poll. path is the key of
+    the value in the result of the reply, dotted for nested objects. The
+    value is converted with value_type (numbers are kept as sent by numeric
+    fields) and multiplied by scale; default replaces a missing or
+    malformed value.
+
+    Fields with a name get a sensor, described by the remaining
+    attributes; statistics fields also get rolling statistics sensors.
+    """
+
+    key: str
+    sources: tuple[tuple[str, str], ...]
+    value_type: type = int
+    scale: float = 1
+    default: Any = 0
+    name: str | None = None
+    unit: str | None = None
+    device_class: SensorDeviceClass | None = None
+    state_class: SensorStateClass | None = None
+    deadband: bool = False
+    statistics: bool = False
+
+
+def _power(key: str, name: str, *sources: tuple[str, str]) -> Field:
+    """Return a power reading, in W, with a deadband and rolling statistics."""
+    return Field(
+        key=key,
+        sources=sources,
+        name=name,
+        unit=UnitOfPower.WATT,
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        deadband=True,
+        statistics=True,
+    )
+
+
+def _phase_power(key: str, name: str) -> Field:
+    """Return a phase power of the energy meter, falling back on ES.GetMode."""
+    return _power(key, name, (CMD_GET_EM_STATUS, key), (CMD_GET_MODE, key))
+
+
+FIELDS: tuple[Field, ...] = (
+    Field(
+        key="soc",
+        sources=((CMD_GET_MODE, "bat_soc"), (CMD_GET_ES_STATUS, "bat_soc")),
+        name="State of Charge",
+        unit=PERCENTAGE,
+        device_class=SensorDeviceClass.BATTERY,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    Field(
+        key="es_mode",
+        sources=((CMD_GET_MODE, "mode"),),
+        value_type=str,
+        default="Unknown",
+        name="ES Mode",
+        device_class=SensorDeviceClass.ENUM,
+    ),
+    _power("ongrid_power", "Grid Power", (CMD_GET_MODE, "ongrid_power"), (CMD_GET_ES_STATUS, "ongrid_power")),
+    _power("offgrid_power", "Off-Grid Power", (CMD_GET_MODE, "offgrid_power"), (CMD_GET_ES_STATUS, "offgrid_power")),
+    _phase_power("a_power", "Phase A Power"),
+    _phase_power("b_power", "Phase B Power"),
+    _phase_power("c_power", "Phase C Power"),
+    _phase_power("total_power", "Total Power"),
+    _power("bat_power", "Battery Power", (CMD_GET_ES_STATUS, "bat_power")),
+    _power("pv_power", "PV Power", (CMD_GET_PV_STATUS, "pv_power"), (CMD_GET_ES_STATUS, "pv_power")),
+    Field(
+        key="bat_temp",
+        sources=((CMD_GET_BAT_STATUS, "bat_temp"),),
+        value_type=float,
+        name="Battery Temperature",
+        unit=UnitOfTemperature.CELSIUS,
+        device_class=SensorDeviceClass.TEMPERATURE,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    Field(
+        key="bat_capacity",
+        sources=((CMD_GET_BAT_STATUS, "bat_capacity"),),
+        name="Battery Capacity",
+        unit=UnitOfEnergy.WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY_STORAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+    ),
+    Field(
+        key="input_energy",
+        sources=((CMD_GET_MODE, "input_energy"),),
+        name="Input Energy",
+        unit=UnitOfEnergy.WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    Field(
+        key="output_energy",
+        sources=((CMD_GET_MODE, "output_energy"),),
+        name="Output Energy",
+        unit=UnitOfEnergy.WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+    ),
+    Field(key="rated_capacity", sources=((CMD_GET_BAT_STATUS, "rated_capacity"),)),
+    Field(key="pv_voltage", sources=((CMD_GET_PV_STATUS, "pv_voltage"),), value_type=float),
+    Field(key="pv_current", sources=((CMD_GET_PV_STATUS, "pv_current"),), value_type=float),
+    Field(key="ct_state", sources=((CMD_GET_EM_STATUS, "ct_state"),)),
+)
+
+FIELD_KEYS: tuple[str, ...] = tuple(field.key for field in FIELDS)
+
+
+@dataclass(frozen=True)
+class EnergyCounter:
+    """Energy integrated from one direction of a power field.
+
+    A positive counter counts the energy while the power is above zero,
+    the other one while it is below. Counters that are not enabled get a
+    sensor disabled by default.
+    """
+
+    key: str
+    power: str
+    positive: bool
+    name: str
+    enabled: bool = True
+
+
+def _phase_energy(phase: str) -> tuple[EnergyCounter, EnergyCounter]:
+    """Return the import and export counters of a phase of the energy meter."""
+    power = f"{phase}_power"
+    name = f"Phase {phase.upper()}"
+    return (
+        EnergyCounter(f"{phase}_import_energy", power, True, f"{name} Import Energy", enabled=False),
+        EnergyCounter(f"{phase}_export_energy", power, False, f"{name} Export Energy", enabled=False),
+    )
+
+
+ENERGY_COUNTERS: tuple[EnergyCounter, ...] = (
+    EnergyCounter("grid_import_energy", "total_power", True, "Grid Import Energy"),
+    EnergyCounter("grid_export_energy", "total_power", False, "Grid Export Energy"),
+    EnergyCounter("ongrid_output_energy", "ongrid_power", True, "On-Grid Output Energy"),
+    EnergyCounter("ongrid_input_energy", "ongrid_power", False, "On-Grid Input Energy"),
+    EnergyCounter("offgrid_output_energy", "offgrid_power", True, "Off-Grid Output Energy"),
+    *_phase_energy("a"),
+    *_phase_energy("b"),
+    *_phase_energy("c"),
+)
+
+_SOURCES: dict[str, frozenset[str]] = {
+    field.key: frozenset(command for command, _ in field.sources) for field in FIELDS
+}
+
+# Commands each statistics field is read from
+STATISTICS_SOURCES: dict[str, frozenset[str]] = {
+    field.key: _SOURCES[field.key] for field in FIELDS if field.statistics
+}
+
+# Commands each power field integrated into energy counters is read from
+ENERGY_SOURCES: dict[str, frozenset[str]] = {
+    counter.power: _SOURCES[counter.power] for counter in ENERGY_COUNTERS
+}
+
+
+class BatteryData:
+    """Readings of a battery, one slot per field.
+
+    A reading the battery never reported is None. The mapping-style get
+    and items keep the object usable where a dict of readings was.
+    """
+
+    __slots__ = FIELD_KEYS
+
+    def __init__(self) -> None:
+        """Initialize the data with no readings."""
+        for key in FIELD_KEYS:
+            setattr(self, key, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a reading, or default if it is unknown."""
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        """Return a known reading."""
+        value = getattr(self, key, None) if key in FIELD_KEYS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def items(self) -> list[tuple[str, Any]]:
+        """Return the known readings."""
+        return [(key, value) for key in FIELD_KEYS if (value := getattr(self, key)) is not None]
+
+    def __eq__(self, other: object) -> bool:
+        """Return True if both hold the same readings."""
+        if not isinstance(other, BatteryData):
+            return NotImplemented
+        return all(getattr(self, key) == getattr(other, key) for key in FIELD_KEYS)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        """Return the known readings."""
+        return f"BatteryData({dict(self.items())})"
+
+    def changes(self, previous: BatteryData) -> set[str]:
+        """Return the keys whose reading differs from previous."""
+        return {key for key in FIELD_KEYS if getattr(self, key) != getattr(previous, key)}
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the known readings as a JSON serializable dict."""
+        return dict(self.items())
+
+    @classmethod
+    def from_dict(cls, values: dict[str, Any]) -> BatteryData:
+        """Return data holding the readings of values; unknown keys are dropped."""
+        data = cls()
+        for key, value in values.items():
+            if key in FIELD_KEYS:
+                setattr(data, key, value)
+        return data
+
+
+def _converter(field: Field) -> Callable[[Any], Any]:
+    """Return the conversion of a raw value of a field.
+
+    Numbers are kept as the battery sent them, so a power of 437.6 W is
+    not truncated by an int field; other values are converted with the
+    value_type of the field.
+    """
+    value_type, scale, default = field.value_type, field.scale, field.default
+    numeric = value_type in (int, float)
+
+    def convert(value: Any) -> Any:
+        if value is None:
+            return default
+        if not (numeric and isinstance(value, (int, float)) and not isinstance(value, bool)):
+            try:
+                value = value_type(value)
+            except (TypeError, ValueError):
+                return default
+        return value * scale if scale != 1 else value
+
+    return convert
+
+
+def _dig(result: dict[str, Any], parts: tuple[str, ...]) -> Any:
+    """Return the value at a nested path of a reply result."""
+    value: Any = result
+    for part in parts:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+# Commands the fields are read from, each looked up once per poll
+_COMMANDS: tuple[str, ...] = tuple(
+    dict.fromkeys(command for field in FIELDS for command, _ in field.sources)
+)
+
+
+def _kept_types(field: Field) -> frozenset[type]:
+    """Return the types of the raw values a field stores without conversion."""
+    if field.scale != 1:
+        return frozenset()
+    if field.value_type in (int, float):
+        return frozenset({int, float})
+    return frozenset({field.value_type})
+
+
+# Per field: its key, its sources as (index in _COMMANDS, nested, path)
+# where a nested path is split in parts, the types stored as they are and
+# the conversion of the others
+_Decoder = tuple[
+    str,
+    tuple[tuple[int, bool, str | tuple[str, ...]], ...],
+    frozenset[type],
+    Callable[[Any], Any],
+]
+_DECODERS: tuple[_Decoder, ...] = tuple(
+    (
+        field.key,
+        tuple(
+            (
+                _COMMANDS.index(command),
+                "." in path,
+                tuple(path.split(".")) if "." in path else path,
+            )
+            for command, path in field.sources
+        ),
+        _kept_types(field),
+        _converter(field),
+    )
+    for field in FIELDS
+)
+
+
+def decode(responses: dict[str, dict[str, Any]], previous: BatteryData | None) -> BatteryData:
+    """Return the readings of the poll replies, keyed by command.
+
+    Each field is read from the most trusted command that answered, in a
+    single pass. Fields of commands that did not answer keep their value
+    in previous.
+    """
+    results: list[dict[str, Any] | None] = []
+    for command in _COMMANDS:
+        response = responses.get(command)
+        result = response.get("result") if response is not None else None
+        results.append(result if isinstance(result, dict) else None)
+
+    # Every slot is assigned below
+    data = BatteryData.__new__(BatteryData)
+    for key, sources, kept, convert in _DECODERS:
+        for index, nested, path in sources:
+            result = results[index]
+            if result is not None:
+                value = _dig(result, path) if nested else result.get(path)
+                setattr(data, key, value if type(value) in kept else convert(value))
+                break
+        else:
+            setattr(data, key, getattr(previous, key) if previous is not None else None)
+    return data
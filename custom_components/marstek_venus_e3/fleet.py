@@ -0,0 +1,100 @@
+"""Shared UDP endpoint for all Marstek Venus E 3.0 batteries."""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from .const import FLEET_MAX_CONCURRENT_POLLS, FLEET_RECEIVE_BUFFER
+from .dispatcher import FleetDispatcher
+from .transport import MarstekUdpTransport
+
+if TYPE_CHECKING:
+    from .coordinator import MarstekVenusE3Coordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class MarstekFleet:
+    """Own the single UDP endpoint used by every configured battery.
+
+    Each config entry registers its coordinator here instead of opening a
+    socket of its own. The endpoint is opened with the first battery and
+    closed with the last one. Replies are routed by source address, request
+    id and ``src`` identity (see MarstekUdpTransport).
+
+    Each coordinator polls on its own timer, but takes one of the fleet's
+    poll_slots for the duration of a poll: at most max_concurrent_polls
+    batteries are polled at the same time, so a large fleet whose timers
+    line up does not overflow the socket receive buffer with a single
+    burst of replies.
+
+    The fleet also indexes coordinators by device registry id, so services
+    find the battery behind a device without walking the registry, and
+    holds the power dispatcher while a site target is being dispatched.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_polls: int = FLEET_MAX_CONCURRENT_POLLS,
+    ) -> None:
+        """Initialize the fleet."""
+        self.transport = MarstekUdpTransport(receive_buffer=FLEET_RECEIVE_BUFFER)
+        # Coordinators are not keyed by address, which changes when a
+        # battery is found again after a DHCP change
+        self._coordinators: dict[MarstekVenusE3Coordinator, None] = {}
+        self._devices: dict[str, MarstekVenusE3Coordinator] = {}
+        self.poll_slots = asyncio.Semaphore(max_concurrent_polls)
+        self.dispatcher: FleetDispatcher | None = None
+
+    @property
+    def coordinators(self) -> list[MarstekVenusE3Coordinator]:
+        """Return the registered coordinators."""
+        return list(self._coordinators)
+
+    @property
+    def devices(self) -> dict[str, MarstekVenusE3Coordinator]:
+        """Return the coordinators keyed by device registry id."""
+        return dict(self._devices)
+
+    def __len__(self) -> int:
+        """Return the number of registered batteries."""
+        return len(self._coordinators)
+
+    def coordinator_for_device(self, device_id: str) -> MarstekVenusE3Coordinator | None:
+        """Return the coordinator of a device registry entry."""
+        return self._devices.get(device_id)
+
+    async def async_register(
+        self,
+        coordinator: MarstekVenusE3Coordinator,
+        device_id: str | None = None,
+    ) -> None:
+        """Register a battery, opening the shared endpoint if needed."""
+        await self.transport.async_open()
+        self._coordinators[coordinator] = None
+        if device_id is not None:
+            self._devices[device_id] = coordinator
+
+    async def async_unregister(self, coordinator: MarstekVenusE3Coordinator) -> bool:
+        """Unregister a battery.
+
+        Returns True once the last battery is gone and the endpoint closed.
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.remove(coordinator)
+        self._coordinators.pop(coordinator, None)
+        for device_id in [
+            device_id for device_id, registered in self._devices.items() if registered is coordinator
+        ]:
+            del self._devices[device_id]
+
+        if self._coordinators:
+            return False
+
+        if self.dispatcher is not None:
+            await self.dispatcher.async_stop()
+            self.dispatcher = None
+        self.transport.close()
+        return True
+
@@ -0,0 +1,165 @@
+"""Transport metrics for Marstek Venus E 3.0."""
+from bisect import bisect_left
+
+# Upper bounds of the round-trip time histogram buckets, in milliseconds.
+# A last, open-ended bucket collects anything slower.
+RTT_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2000, 5000)
+
+
+class CommandMetrics:
+    """Counters and round-trip time histogram of one command.
+
+    Samples only increment preallocated counters, so recording them does
+    not allocate.
+    """
+
+    __slots__ = (
+        "requests",
+        "replies",
+        "retries",
+        "timeouts",
+        "parse_errors",
+        "late_replies",
+        "duplicate_replies",
+        "rtt_buckets",
+        "rtt_total_ms",
+        "rtt_max_ms",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.requests = 0
+        self.replies = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.parse_errors = 0
+        self.late_replies = 0
+        self.duplicate_replies = 0
+        self.rtt_buckets = [0] * (len(RTT_BUCKETS_MS) + 1)
+        self.rtt_total_ms = 0.0
+        self.rtt_max_ms = 0.0
+
+    def record_rtt(self, seconds: float) -> None:
+        """Record the round-trip time of a reply."""
+        rtt_ms = seconds * 1000
+        self.replies += 1
+        self.rtt_buckets[bisect_left(RTT_BUCKETS_MS, rtt_ms)] += 1
+        self.rtt_total_ms += rtt_ms
+        if rtt_ms > self.rtt_max_ms:
+            self.rtt_max_ms = rtt_ms
+
+
+class ControlLoopMetrics:
+    """Timing of the zero-export control loop.
+
+    Jitter is how late a step started compared to its schedule; actuation
+    latency is the time from the grid meter read to the acknowledged
+    setpoint write.
+    """
+
+    __slots__ = (
+        "steps",
+        "writes",
+        "jitter_last_ms",
+        "jitter_max_ms",
+        "jitter_total_ms",
+        "actuation_last_ms",
+        "actuation_max_ms",
+        "actuation_total_ms",
+    )
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.steps = 0
+        self.writes = 0
+        self.jitter_last_ms = 0.0
+        self.jitter_max_ms = 0.0
+        self.jitter_total_ms = 0.0
+        self.actuation_last_ms = 0.0
+        self.actuation_max_ms = 0.0
+        self.actuation_total_ms = 0.0
+
+    def record_step(self, jitter: float) -> None:
+        """Record the start of a step, jitter seconds after its schedule."""
+        jitter_ms = jitter * 1000
+        self.steps += 1
+        self.jitter_last_ms = jitter_ms
+        self.jitter_total_ms += jitter_ms
+        if jitter_ms > self.jitter_max_ms:
+            self.jitter_max_ms = jitter_ms
+
+    def record_actuation(self, latency: float) -> None:
+        """Record an acknowledged setpoint write."""
+        latency_ms = latency * 1000
+        self.writes += 1
+        self.actuation_last_ms = latency_ms
+        self.actuation_total_ms += latency_ms
+        if latency_ms > self.actuation_max_ms:
+            self.actuation_max_ms = latency_ms
+
+    def jitter_mean_ms(self) -> float | None:
+        """Return the mean step jitter."""
+        if not self.steps:
+            return None
+        return round(self.jitter_total_ms / self.steps, 1)
+
+    def actuation_mean_ms(self) -> float | None:
+        """Return the mean actuation latency."""
+        if not self.writes:
+            return None
+        return round(self.actuation_total_ms / self.writes, 1)
+
+
+class DeviceMetrics:
+    """Transport metrics of one battery, broken down by command.
+
+    Also holds the timing of the zero-export control loop.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.commands: dict[str, CommandMetrics] = {}
+        self.control = ControlLoopMetrics()
+
+    def command(self, name: str) -> CommandMetrics:
+        """Return the metrics of a command, creating them on first use."""
+        metrics = self.commands.get(name)
+        if metrics is None:
+            metrics = self.commands[name] = CommandMetrics()
+        return metrics
+
+    def total(self, counter: str) -> int:
+        """Return a counter summed over all commands."""
+        return sum(getattr(metrics, counter) for metrics in self.commands.values())
+
+    def by_command(self, counter: str) -> dict[str, int]:
+        """Return a counter for each command."""
+        return {name: getattr(metrics, counter) for name, metrics in self.commands.items()}
+
+    def rtt_mean_ms(self) -> float | None:
+        """Return the mean round-trip time over all commands."""
+        replies = self.total("replies")
+        if not replies:
+            return None
+        total = sum(metrics.rtt_total_ms for metrics in self.commands.values())
+        return round(total / replies, 1)
+
+    def rtt_percentile_ms(self, percentile: float) -> float | None:
+        """Estimate a round-trip time percentile over all commands.
+
+        Returns the upper bound of the histogram bucket holding the
+        percentile, capped at the slowest round-trip time seen.
+        """
+        replies = self.total("replies")
+        if not replies:
+            return None
+
+        slowest = round(max(metrics.rtt_max_ms for metrics in self.commands.values()), 1)
+        rank = percentile / 100 * replies
+        seen = 0
+        for index, bound in enumerate(RTT_BUCKETS_MS):
+            seen += sum(metrics.rtt_buckets[index] for metrics in self.commands.values())
+            if seen >= rank:
+                return min(float(bound), slowest)
+        return slowest
+
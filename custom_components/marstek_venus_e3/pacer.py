@@ -0,0 +1,73 @@
+"""Adaptive request pacing for Marstek Venus E 3.0."""
+import asyncio
+import time
+
+from .const import PACER_BURST, PACER_ERROR_GAP, PACER_GAP_DECREASE, PACER_MAX_GAP
+
+
+class RequestPacer:
+    """Token bucket spacing the requests sent to one battery.
+
+    The firmware garbles requests that arrive too close together and
+    answers them with -32700. The pacer learns the smallest safe gap
+    between requests from those parse errors: every error doubles the gap
+    (starting at error_gap), and every clean reply shrinks it by
+    gap_decrease, ten times slower once it gets close to the gap at which
+    the last error happened. Timeouts are not used, as they mostly come
+    from packet loss or an unreachable battery.
+
+    While the gap is zero requests are not paced at all; otherwise the
+    bucket refills one token per gap and holds at most burst tokens.
+    """
+
+    def __init__(
+        self,
+        burst: int = PACER_BURST,
+        error_gap: float = PACER_ERROR_GAP,
+        max_gap: float = PACER_MAX_GAP,
+        gap_decrease: float = PACER_GAP_DECREASE,
+    ) -> None:
+        """Initialize the pacer."""
+        self.burst = burst
+        self.error_gap = error_gap
+        self.max_gap = max_gap
+        self.gap_decrease = gap_decrease
+        self.gap = 0.0
+        self._failed_gap = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def async_acquire(self) -> None:
+        """Wait until the next request may be sent."""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) * self.gap)
+
+    def record_success(self) -> None:
+        """Record a clean reply."""
+        if self.gap:
+            step = self.gap_decrease
+            if self.gap < self._failed_gap * 1.25:
+                # Probe carefully around the gap known to overload the battery
+                step /= 10
+            self.gap = max(0.0, self.gap - step)
+
+    def record_error(self) -> None:
+        """Record a parse error."""
+        self._refill()
+        self._failed_gap = self.gap
+        self.gap = min(self.max_gap, max(self.error_gap, self.gap * 2))
+        # Stop any burst already under way
+        self._tokens = min(self._tokens, 0.0)
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = time.monotonic()
+        if self.gap:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.gap)
+        else:
+            self._tokens = float(self.burst)
+        self._updated = now
@@ -0,0 +1,95 @@
+"""Retry policies for Marstek Venus E 3.0 commands."""
+from dataclasses import dataclass, replace
+import random
+
+from .const import (
+    CMD_SET_MODE,
+    DEFAULT_BACKOFF_BASE,
+    DEFAULT_BACKOFF_MAX,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_READ_DEADLINE,
+    DEFAULT_READ_MAX_RETRIES,
+    DEFAULT_TIMEOUT,
+    DEFAULT_WRITE_DEADLINE,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry budget of a command.
+
+    A command is attempted at most max_attempts times, each attempt waiting
+    at most attempt_timeout for a reply, and gives up once deadline seconds
+    have passed since the first attempt, whichever comes first.
+    """
+
+    max_attempts: int
+    attempt_timeout: float
+    deadline: float
+    backoff_base: float = DEFAULT_BACKOFF_BASE
+    backoff_max: float = DEFAULT_BACKOFF_MAX
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay before the attempt following attempt.
+
+        Uses "full jitter": a random delay between 0 and an exponentially
+        growing cap, so batteries retried at the same time spread out.
+        """
+        cap = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, cap)
+
+
+# Reads fail fast: the previous values are served until the next poll
+READ_POLICY = RetryPolicy(
+    max_attempts=DEFAULT_READ_MAX_RETRIES,
+    attempt_timeout=DEFAULT_TIMEOUT,
+    deadline=DEFAULT_READ_DEADLINE,
+)
+
+# Writes retry harder: a lost mode change is not repaired by the next poll
+WRITE_POLICY = RetryPolicy(
+    max_attempts=DEFAULT_MAX_RETRIES,
+    attempt_timeout=DEFAULT_TIMEOUT,
+    deadline=DEFAULT_WRITE_DEADLINE,
+)
+
+# Single cheap request used to probe an offline battery
+PROBE_POLICY = RetryPolicy(
+    max_attempts=1,
+    attempt_timeout=DEFAULT_TIMEOUT,
+    deadline=DEFAULT_TIMEOUT,
+)
+
+# Commands not listed here use READ_POLICY
+DEFAULT_RETRY_POLICIES: dict[str, RetryPolicy] = {
+    CMD_SET_MODE: WRITE_POLICY,
+}
+
+
+def scaled_policies(
+    timeout: float,
+    max_attempts: int,
+) -> tuple[RetryPolicy, RetryPolicy, RetryPolicy]:
+    """Return the read, write and probe policies for another retry budget.
+
+    timeout is the time an attempt waits for a reply and max_attempts the
+    attempts of a write; reads never get more attempts than writes. The
+    deadlines keep their default ratio to the time the attempts take.
+    """
+    read_attempts = min(READ_POLICY.max_attempts, max_attempts)
+    return (
+        replace(
+            READ_POLICY,
+            max_attempts=read_attempts,
+            attempt_timeout=timeout,
+            deadline=READ_POLICY.deadline * timeout / DEFAULT_TIMEOUT,
+        ),
+        replace(
+            WRITE_POLICY,
+            max_attempts=max_attempts,
+            attempt_timeout=timeout,
+            deadline=WRITE_POLICY.deadline * timeout * max_attempts
+            / (DEFAULT_TIMEOUT * WRITE_POLICY.max_attempts),
+        ),
+        replace(PROBE_POLICY, attempt_timeout=timeout, deadline=timeout),
+    )
@@ -0,0 +1,205 @@
+"""Rolling statistics of Marstek Venus E 3.0 readings."""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from collections.abc import Iterable
+import math
+from typing import Any
+
+
+class RollingWindow:
+    """Mean, extremes, spread and ramp rate of the last seconds of a series.
+
+    The window only holds running sums and the sequence numbers of its
+    samples; the samples themselves stay in the ring buffer of the
+    series. Sums are updated as samples enter and leave the window, and
+    the extremes are kept in monotonic queues, so each sample costs O(1)
+    amortized whatever the window length.
+    """
+
+    __slots__ = ("seconds", "_series", "start", "count", "total", "squares", "_minima", "_maxima")
+
+    def __init__(self, series: RollingSeries, seconds: float) -> None:
+        """Initialize an empty window."""
+        self.seconds = seconds
+        self._series = series
+        self.start = 0  # Sequence number of the oldest sample in the window
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self._minima: deque[int] = deque()
+        self._maxima: deque[int] = deque()
+
+    def push(self, seq: int, value: float) -> None:
+        """Add the newest sample."""
+        if not self.count:
+            self.start = seq
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        values = self._series.values
+        capacity = self._series.capacity
+        while self._minima and values[self._minima[-1] % capacity] >= value:
+            self._minima.pop()
+        self._minima.append(seq)
+        while self._maxima and values[self._maxima[-1] % capacity] <= value:
+            self._maxima.pop()
+        self._maxima.append(seq)
+
+    def pop(self) -> None:
+        """Remove the oldest sample."""
+        seq = self.start
+        value = self._series.values[seq % self._series.capacity]
+        self.start += 1
+        self.count -= 1
+        if not self.count:
+            # Start again from exact sums rather than rounding leftovers
+            self.total = self.squares = 0.0
+        else:
+            self.total -= value
+            self.squares -= value * value
+        if self._minima and self._minima[0] == seq:
+            self._minima.popleft()
+        if self._maxima and self._maxima[0] == seq:
+            self._maxima.popleft()
+
+    def expire(self, now: float) -> None:
+        """Remove the samples older than the window."""
+        times = self._series.times
+        capacity = self._series.capacity
+        while self.count and times[self.start % capacity] <= now - self.seconds:
+            self.pop()
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean of the samples, or None without samples."""
+        return self.total / self.count if self.count else None
+
+    @property
+    def minimum(self) -> float | None:
+        """Return the smallest sample."""
+        if not self.count:
+            return None
+        return self._series.values[self._minima[0] % self._series.capacity]
+
+    @property
+    def maximum(self) -> float | None:
+        """Return the largest sample."""
+        if not self.count:
+            return None
+        return self._series.values[self._maxima[0] % self._series.capacity]
+
+    @property
+    def stddev(self) -> float | None:
+        """Return the population standard deviation of the samples."""
+        if not self.count:
+            return None
+        mean = self.total / self.count
+        return math.sqrt(max(0.0, self.squares / self.count - mean * mean))
+
+    @property
+    def ramp_rate(self) -> float | None:
+        """Return the change from the oldest to the newest sample, per minute."""
+        if self.count < 2:
+            return None
+        series = self._series
+        first = self.start % series.capacity
+        last = (self.start + self.count - 1) % series.capacity
+        elapsed = series.times[last] - series.times[first]
+        if elapsed <= 0:
+            return None
+        return (series.values[last] - series.values[first]) * 60 / elapsed
+
+
+class RollingSeries:
+    """Fixed-size ring buffer of the samples of one reading.
+
+    The buffer is sized for the longest window at the fastest poll
+    interval. If samples arrive faster than that, the oldest ones are
+    overwritten and leave every window early.
+    """
+
+    __slots__ = ("capacity", "times", "values", "next", "windows")
+
+    def __init__(self, windows: Iterable[float], capacity: int) -> None:
+        """Initialize an empty series."""
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.next = 0  # Sequence number of the next sample
+        self.windows = {seconds: RollingWindow(self, seconds) for seconds in windows}
+
+    def add(self, now: float, value: float) -> None:
+        """Add a sample taken at now (monotonic time)."""
+        seq = self.next
+        if seq >= self.capacity:
+            # The slot is reused: its sample leaves the windows still holding it
+            oldest = seq - self.capacity
+            for window in self.windows.values():
+                if window.count and window.start == oldest:
+                    window.pop()
+        slot = seq % self.capacity
+        self.times[slot] = now
+        self.values[slot] = value
+        self.next = seq + 1
+        for window in self.windows.values():
+            window.push(seq, value)
+            window.expire(now)
+
+    def expire(self, now: float) -> None:
+        """Remove the samples older than each window."""
+        for window in self.windows.values():
+            window.expire(now)
+
+    def samples(self) -> list[tuple[float, float]]:
+        """Return the samples still in the buffer, oldest first."""
+        return [
+            (self.times[seq % self.capacity], self.values[seq % self.capacity])
+            for seq in range(max(0, self.next - self.capacity), self.next)
+        ]
+
+
+class RollingStatistics:
+    """Rolling statistics of several readings of a battery.
+
+    sources maps each tracked data key to the poll commands it is read
+    from; a key only gets a sample when one of them answered, so values
+    carried over from an earlier poll are not counted twice.
+    """
+
+    def __init__(
+        self,
+        sources: dict[str, frozenset[str]],
+        windows: Iterable[float],
+        capacity: int,
+    ) -> None:
+        """Initialize the statistics."""
+        self.windows = tuple(windows)
+        self._sources = sources
+        self.series = {key: RollingSeries(self.windows, capacity) for key in sources}
+
+    def add(self, now: float, data: Any, commands: Iterable[str]) -> None:
+        """Record the readings of a poll answered by commands."""
+        answered = set(commands)
+        for key, series in self.series.items():
+            value = data.get(key)
+            if isinstance(value, (int, float)) and not answered.isdisjoint(self._sources[key]):
+                series.add(now, value)
+            else:
+                series.expire(now)
+
+    def window(self, key: str, seconds: float) -> RollingWindow | None:
+        """Return the window of a tracked reading, or None."""
+        series = self.series.get(key)
+        return series.windows.get(seconds) if series is not None else None
+
+    def resize(self, capacity: int) -> None:
+        """Change the size of the ring buffers, keeping the newest samples."""
+        for key, series in self.series.items():
+            if series.capacity == capacity:
+                continue
+            resized = RollingSeries(self.windows, capacity)
+            for now, value in series.samples()[-capacity:]:
+                resized.add(now, value)
+            self.series[key] = resized
@@ -0,0 +1,56 @@
+"""Adaptive polling scheduler for Marstek Venus E 3.0."""
+from typing import Any
+
+from .const import ADAPTIVE_HOLD_TIME, ADAPTIVE_POWER_THRESHOLD, ADAPTIVE_WATCHED_KEYS
+
+
+class AdaptivePollScheduler:
+    """Pick the next poll interval from recent power activity.
+
+    The battery is polled at the fast interval while the watched power
+    readings move by more than the threshold, and for a hold time after
+    that or after a mode change. Once readings are stable the interval
+    doubles on every poll until it reaches the slow interval.
+    """
+
+    def __init__(
+        self,
+        fast_interval: float,
+        slow_interval: float,
+        threshold: float = ADAPTIVE_POWER_THRESHOLD,
+        hold_time: float = ADAPTIVE_HOLD_TIME,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.fast_interval = fast_interval
+        self.slow_interval = max(slow_interval, fast_interval)
+        self.threshold = threshold
+        self.hold_time = hold_time
+        self.interval = self.slow_interval
+        self._fast_until = 0.0
+        self._previous: dict[str, Any] = {}
+
+    def boost(self, now: float) -> float:
+        """Switch to fast polling, e.g. right after a mode change."""
+        self._fast_until = now + self.hold_time
+        self.interval = self.fast_interval
+        return self.interval
+
+    def next_interval(self, data: dict[str, Any], now: float) -> float:
+        """Return the interval until the next poll after data was received."""
+        for key in ADAPTIVE_WATCHED_KEYS:
+            value = data.get(key)
+            previous = self._previous.get(key)
+            if (
+                isinstance(value, (int, float))
+                and isinstance(previous, (int, float))
+                and abs(value - previous) > self.threshold
+            ):
+                self._fast_until = now + self.hold_time
+                break
+        self._previous = {key: data.get(key) for key in ADAPTIVE_WATCHED_KEYS}
+
+        if now < self._fast_until:
+            self.interval = self.fast_interval
+        else:
+            self.interval = min(self.interval * 2, self.slow_interval)
+        return self.interval
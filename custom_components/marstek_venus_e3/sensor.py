@@ -4,116 +4,235 @@ from __future__ import annotations
 from collections.abc import Callable
 from dataclasses import dataclass
 import logging
+from operator import attrgetter
+import time
+from typing import Any
 
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import (
-    PERCENTAGE,
-    UnitOfEnergy,
-    UnitOfPower,
-)
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.const import UnitOfEnergy, UnitOfTime
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, CONF_IP_ADDRESS
+from .const import DOMAIN, CONF_IP_ADDRESS, STATISTICS_WINDOWS
 from .coordinator import MarstekVenusE3Coordinator
+from .fields import ENERGY_COUNTERS, FIELDS, BatteryData, EnergyCounter, Field
+from .rolling import RollingWindow
 
 _LOGGER = logging.getLogger(__name__)
 
 
 @dataclass
 class MarstekSensorEntityDescription(SensorEntityDescription):
-    """Describes Marstek sensor entity."""
+    """Describes Marstek sensor entity.
 
-    value_fn: Callable[[dict], float | int | str | None] = None
+    deadband sensors publish through the deadband of the coordinator.
+    """
 
+    value_fn: Callable[[BatteryData], float | int | str | None] = None
+    deadband: bool = False
 
-SENSOR_TYPES: tuple[MarstekSensorEntityDescription, ...] = (
-    MarstekSensorEntityDescription(
-        key="soc",
-        name="State of Charge",
-        native_unit_of_measurement=PERCENTAGE,
-        device_class=SensorDeviceClass.BATTERY,
-        state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("soc"),
-    ),
-    MarstekSensorEntityDescription(
-        key="es_mode",
-        name="ES Mode",
-        device_class=SensorDeviceClass.ENUM,
-        value_fn=lambda data: data.get("es_mode"),
-    ),
-    MarstekSensorEntityDescription(
-        key="ongrid_power",
-        name="Grid Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+
+@dataclass
+class MarstekDiagnosticSensorEntityDescription(SensorEntityDescription):
+    """Describes Marstek transport metrics sensor entity.
+
+    value_fn and attributes_fn read the coordinator rather than its data.
+    """
+
+    value_fn: Callable[[MarstekVenusE3Coordinator], float | int | None] = None
+    attributes_fn: Callable[[MarstekVenusE3Coordinator], dict[str, Any]] | None = None
+    entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    entity_registry_enabled_default: bool = False
+
+
+@dataclass
+class MarstekStatisticSensorEntityDescription(MarstekDiagnosticSensorEntityDescription):
+    """Describes Marstek rolling statistics sensor entity.
+
+    The state is the mean of a reading over the window; the attributes
+    hold the other statistics.
+    """
+
+    entity_category: EntityCategory | None = None
+
+
+@dataclass
+class MarstekEnergySensorEntityDescription(SensorEntityDescription):
+    """Describes Marstek integrated energy sensor entity.
+
+    value_fn reads the energy counters of the coordinator; power and
+    positive name the counter the sensor restores on startup.
+    """
+
+    value_fn: Callable[[MarstekVenusE3Coordinator], float] = None
+    power: str = ""
+    positive: bool = True
+
+
+def _counter_description(key: str, name: str) -> MarstekDiagnosticSensorEntityDescription:
+    """Describe a transport counter, broken down by command in its attributes."""
+    return MarstekDiagnosticSensorEntityDescription(
+        key=key,
+        name=name,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda coordinator: coordinator.metrics.total(key),
+        attributes_fn=lambda coordinator: coordinator.metrics.by_command(key),
+    )
+
+
+def _field_description(field: Field) -> MarstekSensorEntityDescription:
+    """Describe the sensor of a field."""
+    return MarstekSensorEntityDescription(
+        key=field.key,
+        name=field.name,
+        native_unit_of_measurement=field.unit,
+        device_class=field.device_class,
+        state_class=field.state_class,
+        deadband=field.deadband,
+        value_fn=attrgetter(field.key),
+    )
+
+
+# One sensor per named field, in the order of FIELDS
+SENSOR_TYPES: tuple[MarstekSensorEntityDescription, ...] = tuple(
+    _field_description(field) for field in FIELDS if field.name is not None
+)
+
+
+def _round(value: float | None) -> float | None:
+    """Round a statistic for display."""
+    return round(value, 1) if value is not None else None
+
+
+def _statistic_description(field: Field, seconds: int) -> MarstekStatisticSensorEntityDescription:
+    """Describe the rolling statistics of a field over a window."""
+
+    def window(coordinator: MarstekVenusE3Coordinator) -> RollingWindow | None:
+        return coordinator.statistics.window(field.key, seconds)
+
+    def attributes(coordinator: MarstekVenusE3Coordinator) -> dict[str, Any]:
+        stats = window(coordinator)
+        if stats is None:
+            return {}
+        return {
+            "min": stats.minimum,
+            "max": stats.maximum,
+            "stddev": _round(stats.stddev),
+            "ramp_rate": _round(stats.ramp_rate),  # Per minute
+            "samples": stats.count,
+        }
+
+    minutes = seconds // 60
+    return MarstekStatisticSensorEntityDescription(
+        key=f"{field.key}_mean_{minutes}m",
+        name=f"{field.name} {minutes} min Average",
+        native_unit_of_measurement=field.unit,
+        device_class=field.device_class,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("ongrid_power"),
-    ),
-    MarstekSensorEntityDescription(
-        key="offgrid_power",
-        name="Off-Grid Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+        value_fn=lambda coordinator: _round(stats.mean) if (stats := window(coordinator)) else None,
+        attributes_fn=attributes,
+    )
+
+
+# Mean of each statistics field over each window, disabled by default
+STATISTIC_SENSOR_TYPES: tuple[MarstekStatisticSensorEntityDescription, ...] = tuple(
+    _statistic_description(field, seconds)
+    for field in FIELDS
+    if field.statistics
+    for seconds in STATISTICS_WINDOWS
+)
+
+
+def _energy_description(counter: EnergyCounter) -> MarstekEnergySensorEntityDescription:
+    """Describe the sensor of an energy counter, in kWh."""
+    return MarstekEnergySensorEntityDescription(
+        key=counter.key,
+        name=counter.name,
+        native_unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        suggested_display_precision=3,
+        entity_registry_enabled_default=counter.enabled,
+        power=counter.power,
+        positive=counter.positive,
+        value_fn=lambda coordinator: round(
+            coordinator.energy.total(counter.power, counter.positive) / 1000, 3
+        ),
+    )
+
+
+ENERGY_SENSOR_TYPES: tuple[MarstekEnergySensorEntityDescription, ...] = tuple(
+    _energy_description(counter) for counter in ENERGY_COUNTERS
+)
+
+
+DIAGNOSTIC_SENSOR_TYPES: tuple[MarstekDiagnosticSensorEntityDescription, ...] = (
+    MarstekDiagnosticSensorEntityDescription(
+        key="rtt_mean",
+        name="Round-trip Time",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("offgrid_power"),
+        value_fn=lambda coordinator: coordinator.metrics.rtt_mean_ms(),
     ),
-    MarstekSensorEntityDescription(
-        key="a_power",
-        name="Phase A Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+    MarstekDiagnosticSensorEntityDescription(
+        key="rtt_p95",
+        name="Round-trip Time p95",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("a_power"),
+        value_fn=lambda coordinator: coordinator.metrics.rtt_percentile_ms(95),
     ),
-    MarstekSensorEntityDescription(
-        key="b_power",
-        name="Phase B Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+    MarstekDiagnosticSensorEntityDescription(
+        key="control_jitter",
+        name="Zero-export Loop Jitter",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("b_power"),
+        value_fn=lambda coordinator: coordinator.metrics.control.jitter_mean_ms(),
+        attributes_fn=lambda coordinator: {
+            "last": round(coordinator.metrics.control.jitter_last_ms, 1),
+            "max": round(coordinator.metrics.control.jitter_max_ms, 1),
+            "steps": coordinator.metrics.control.steps,
+        },
     ),
-    MarstekSensorEntityDescription(
-        key="c_power",
-        name="Phase C Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+    MarstekDiagnosticSensorEntityDescription(
+        key="control_actuation_latency",
+        name="Zero-export Actuation Latency",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("c_power"),
+        value_fn=lambda coordinator: coordinator.metrics.control.actuation_mean_ms(),
+        attributes_fn=lambda coordinator: {
+            "last": round(coordinator.metrics.control.actuation_last_ms, 1),
+            "max": round(coordinator.metrics.control.actuation_max_ms, 1),
+            "writes": coordinator.metrics.control.writes,
+        },
     ),
-    MarstekSensorEntityDescription(
-        key="total_power",
-        name="Total Power",
-        native_unit_of_measurement=UnitOfPower.WATT,
-        device_class=SensorDeviceClass.POWER,
+    MarstekDiagnosticSensorEntityDescription(
+        key="request_gap",
+        name="Request Gap",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
         state_class=SensorStateClass.MEASUREMENT,
-        value_fn=lambda data: data.get("total_power"),
-    ),
-    MarstekSensorEntityDescription(
-        key="input_energy",
-        name="Input Energy",
-        native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
-        device_class=SensorDeviceClass.ENERGY,
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        value_fn=lambda data: data.get("input_energy"),
-    ),
-    MarstekSensorEntityDescription(
-        key="output_energy",
-        name="Output Energy",
-        native_unit_of_measurement=UnitOfEnergy.WATT_HOUR,
-        device_class=SensorDeviceClass.ENERGY,
-        state_class=SensorStateClass.TOTAL_INCREASING,
-        value_fn=lambda data: data.get("output_energy"),
+        value_fn=lambda coordinator: round(coordinator.pacer.gap * 1000, 1),
     ),
+    _counter_description("requests", "Requests"),
+    _counter_description("retries", "Retries"),
+    _counter_description("timeouts", "Timeouts"),
+    _counter_description("parse_errors", "Parse Errors"),
+    _counter_description("late_replies", "Late Replies"),
+    _counter_description("duplicate_replies", "Duplicate Replies"),
 )
 
 
@@ -129,6 +248,18 @@ async def async_setup_entry(
         MarstekSensor(coordinator, entry, description)
         for description in SENSOR_TYPES
     ]
+    entities.extend(
+        MarstekStatisticSensor(coordinator, entry, description)
+        for description in STATISTIC_SENSOR_TYPES
+    )
+    entities.extend(
+        MarstekEnergySensor(coordinator, entry, description)
+        for description in ENERGY_SENSOR_TYPES
+    )
+    entities.extend(
+        MarstekDiagnosticSensor(coordinator, entry, description)
+        for description in DIAGNOSTIC_SENSOR_TYPES
+    )
 
     async_add_entities(entities)
 
@@ -138,6 +269,8 @@ class MarstekSensor(CoordinatorEntity, SensorEntity):
 
     entity_description: MarstekSensorEntityDescription
     _attr_has_entity_name = True
+    # Only updated when a poll changes the data key of the sensor
+    _update_on_change = True
 
     def __init__(
         self,
@@ -146,7 +279,7 @@ class MarstekSensor(CoordinatorEntity, SensorEntity):
         description: MarstekSensorEntityDescription,
     ) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, description.key if self._update_on_change else None)
         self.entity_description = description
         self._attr_unique_id = f"{entry.entry_id}_{description.key}"
 
@@ -156,10 +289,158 @@ class MarstekSensor(CoordinatorEntity, SensorEntity):
             manufacturer="Marstek",
             model="Venus E 3.0",
         )
+        # Value held by the deadband, and when it was published
+        self._published: float | int | None = None
+        self._published_at = 0.0
+        # Publishes a reading held back by the deadband once the heartbeat
+        # expires, as no further poll may change the data key
+        self._cancel_heartbeat: CALLBACK_TYPE | None = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel the pending heartbeat."""
+        await super().async_will_remove_from_hass()
+        self._async_cancel_heartbeat()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the new state, unless the reading stayed within its deadband."""
+        self._async_cancel_heartbeat()
+        deadband = self.coordinator.deadband
+        if not (self.entity_description.deadband and deadband.enabled and self.available):
+            self._published = None
+        else:
+            value = self._reading()
+            now = time.monotonic()
+            if (
+                self._published is not None
+                and value is not None
+                and not deadband.should_publish(value, self._published, now - self._published_at)
+            ):
+                if value != self._published:
+                    self._cancel_heartbeat = async_call_later(
+                        self.hass,
+                        max(0.0, self._published_at + deadband.heartbeat - now),
+                        self._async_heartbeat,
+                    )
+                return
+            self._published = value
+            self._published_at = now
+        super()._handle_coordinator_update()
+
+    @callback
+    def _async_heartbeat(self, _now: Any) -> None:
+        """Publish the reading held back by the deadband."""
+        self._cancel_heartbeat = None
+        self._handle_coordinator_update()
+
+    @callback
+    def _async_cancel_heartbeat(self) -> None:
+        """Cancel the pending heartbeat, if any."""
+        if self._cancel_heartbeat is not None:
+            self._cancel_heartbeat()
+            self._cancel_heartbeat = None
 
     @property
     def native_value(self) -> float | int | str | None:
         """Return the state of the sensor."""
+        if self._published is not None:
+            return self._published
+        return self._reading()
+
+    def _reading(self) -> float | int | str | None:
+        """Return the value of the sensor in the last poll."""
         if self.coordinator.data and self.entity_description.value_fn:
             return self.entity_description.value_fn(self.coordinator.data)
         return None
+
+
+class MarstekDiagnosticSensor(MarstekSensor):
+    """Transport metrics of a Marstek Venus E 3.0 battery."""
+
+    entity_description: MarstekDiagnosticSensorEntityDescription
+    # Metrics move with every poll, whatever the data
+    _update_on_change = False
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the new state on every update."""
+        self.async_write_ha_state()
+
+    @property
+    def available(self) -> bool:
+        """Return True; metrics are most useful while the battery is unreachable."""
+        return True
+
+    @property
+    def native_value(self) -> float | int | None:
+        """Return the state of the sensor."""
+        return self.entity_description.value_fn(self.coordinator)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the per-command breakdown of the metric."""
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self.coordinator)
+
+
+class MarstekStatisticSensor(MarstekDiagnosticSensor):
+    """Rolling statistics of a Marstek Venus E 3.0 reading."""
+
+    entity_description: MarstekStatisticSensorEntityDescription
+    # Recomputed on every poll; only the mean is worth keeping in history
+    _unrecorded_attributes = frozenset({"min", "max", "stddev", "ramp_rate", "samples"})
+
+    @property
+    def available(self) -> bool:
+        """Return True while the battery answers."""
+        return self.coordinator.last_update_success
+
+
+class MarstekEnergySensor(MarstekSensor, RestoreSensor):
+    """Energy integrated from a Marstek Venus E 3.0 power reading.
+
+    The counter continues from the last state recorded by Home Assistant
+    when it is higher than the one of the snapshot, which is saved less
+    often and may be older after a crash, so the state never goes down.
+    """
+
+    entity_description: MarstekEnergySensorEntityDescription
+    # Counters move with the power readings, not with a single data key
+    _update_on_change = False
+
+    def __init__(
+        self,
+        coordinator: MarstekVenusE3Coordinator,
+        entry: ConfigEntry,
+        description: MarstekEnergySensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry, description)
+        # Availability and value last written to the state machine
+        self._written: tuple[bool, float] | None = None
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the counter from the last recorded state."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is None or not isinstance(last.native_value, (int, float)):
+            return
+        description = self.entity_description
+        self.coordinator.energy.restore_total(
+            description.power, description.positive, float(last.native_value) * 1000
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the new state when the counter moved or availability changed."""
+        written = (self.available, self.native_value)
+        if written == self._written:
+            return
+        self._written = written
+        self.async_write_ha_state()
+
+    @property
+    def native_value(self) -> float:
+        """Return the state of the sensor."""
+        return self.entity_description.value_fn(self.coordinator)
@@ -0,0 +1,296 @@
+"""UDP transport for Marstek Venus E 3.0."""
+import asyncio
+from collections import OrderedDict
+import json
+import logging
+import socket
+import time
+from typing import Any
+
+from .metrics import DeviceMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+# Number of released requests remembered to classify stray replies
+CLOSED_REQUEST_MEMORY = 1024
+
+
+class _PendingRequest:
+    """A request waiting for its reply."""
+
+    __slots__ = ("future", "method", "sent_at", "metrics")
+
+    def __init__(
+        self,
+        future: asyncio.Future,
+        method: str,
+        metrics: DeviceMetrics | None,
+    ) -> None:
+        """Initialize the request."""
+        self.future = future
+        self.method = method
+        self.sent_at = time.monotonic()
+        self.metrics = metrics
+
+
+class MarstekUdpProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol forwarding battery replies to the transport."""
+
+    def __init__(self, transport: "MarstekUdpTransport") -> None:
+        """Initialize the protocol."""
+        self._owner = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Handle an incoming datagram."""
+        self._owner.handle_datagram(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        """Handle a socket level error (e.g. ICMP port unreachable)."""
+        _LOGGER.debug("UDP error received: %s", exc)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        """Handle the endpoint being closed."""
+        self._owner.handle_connection_lost(exc)
+
+
+class MarstekUdpTransport:
+    """Long-lived UDP endpoint running on the event loop.
+
+    A single socket bound to an ephemeral port is opened once and reused
+    for every request, so no executor thread is needed to send a command
+    and wait for its reply. Each request gets its own JSON-RPC id and
+    replies are matched back to it by (host, id), which allows several
+    commands to be in flight towards the same battery at once.
+
+    The endpoint can be shared by many batteries. Each reply carries the
+    identity of the battery in its ``src`` field (e.g.
+    ``VenusE 3.0-009b08a5e322``), which is used to route replies that come
+    back from another address than the one the request was sent to.
+
+    Requests sent with a DeviceMetrics record their round-trip time there.
+    Replies arriving after their request was released are counted as late
+    (never answered) or duplicate (already answered).
+    """
+
+    def __init__(self, receive_buffer: int | None = None) -> None:
+        """Initialize the transport."""
+        self._transport: asyncio.DatagramTransport | None = None
+        self._pending: dict[tuple[str, int], _PendingRequest] = {}
+        self._closed: OrderedDict[tuple[str, int], tuple[DeviceMetrics, str, bool]] = OrderedDict()
+        self._next_id = 0
+        self._receive_buffer = receive_buffer
+        self._hosts_by_src: dict[str, str] = {}
+        self._srcs_by_host: dict[str, str] = {}
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if the endpoint is open."""
+        return self._transport is not None and not self._transport.is_closing()
+
+    @property
+    def local_port(self) -> int | None:
+        """Return the local port the endpoint is bound to."""
+        if self._transport is None:
+            return None
+        return self._transport.get_extra_info("sockname")[1]
+
+    async def async_open(self) -> None:
+        """Open the UDP endpoint."""
+        if self.is_open:
+            return
+
+        loop = asyncio.get_running_loop()
+        # Bind to an ephemeral port (0 = let OS choose a free port)
+        # This avoids conflicts if port 30000 is already in use locally
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: MarstekUdpProtocol(self),
+            local_addr=("0.0.0.0", 0),
+        )
+        if self._receive_buffer:
+            # Leave room for a burst of replies from many batteries
+            sock = self._transport.get_extra_info("socket")
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self._receive_buffer)
+            except OSError as err:
+                _LOGGER.debug("Could not set UDP receive buffer: %s", err)
+        _LOGGER.debug("Bound to local port %d for receiving responses", self.local_port)
+
+    def close(self) -> None:
+        """Close the UDP endpoint and fail any outstanding request."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._fail_pending(ConnectionError("UDP transport closed"))
+
+    def send_request(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: dict[str, Any],
+        metrics: DeviceMetrics | None = None,
+    ) -> tuple[int, asyncio.Future]:
+        """Send a request and return its id and the future of its reply.
+
+        The caller owns the returned id and must release it with
+        cancel_request() once it no longer waits for the reply.
+        """
+        if not self.is_open:
+            raise ConnectionError("UDP transport is not open")
+
+        request_id = self._allocate_id(host)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[(host, request_id)] = _PendingRequest(future, method, metrics)
+        if metrics is not None:
+            metrics.command(method).requests += 1
+
+        request = {
+            "id": request_id,
+            "method": method,
+            "params": params,
+        }
+        # Send request (use separators for compact JSON like Jeedom script)
+        message = json.dumps(request, separators=(",", ":")).encode("utf-8")
+        _LOGGER.debug("Sending UDP request to %s:%d: %s", host, port, message.decode("utf-8"))
+        self._transport.sendto(message, (host, port))
+
+        return request_id, future
+
+    def identity(self, host: str) -> str | None:
+        """Return the src identity last reported by the battery at host."""
+        return self._srcs_by_host.get(host)
+
+    def cancel_request(self, host: str, request_id: int) -> None:
+        """Stop waiting for the reply to a request."""
+        pending = self._pending.pop((host, request_id), None)
+        if pending is None:
+            return
+        future = pending.future
+        if pending.metrics is not None:
+            self._remember_closed(host, request_id, pending, future.done())
+        if not future.done():
+            future.cancel()
+        elif not future.cancelled():
+            # Mark an unused error as retrieved so asyncio does not log it
+            future.exception()
+
+    async def async_request(
+        self,
+        host: str,
+        port: int,
+        method: str,
+        params: dict[str, Any],
+        timeout: float,
+        metrics: DeviceMetrics | None = None,
+    ) -> dict[str, Any]:
+        """Send a single request to a battery and wait for its reply."""
+        request_id, future = self.send_request(host, port, method, params, metrics)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.cancel_request(host, request_id)
+
+    def handle_datagram(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Resolve the pending request matching the datagram."""
+        host = addr[0]
+        try:
+            response = json.loads(data.decode("utf-8", errors="strict"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as err:
+            _LOGGER.error("Failed to decode JSON response from %s: %s", addr, err)
+            pending = self._oldest_pending(host)
+            if pending is not None:
+                pending.future.set_exception(err)
+            return
+
+        request_id = response.get("id") if isinstance(response, dict) else None
+        src = response.get("src") if isinstance(response, dict) else None
+        if isinstance(request_id, int):
+            pending = self._pending.get((host, request_id))
+            if pending is None and src in self._hosts_by_src:
+                # The battery answered from another address than the one
+                # the request was sent to; route it by its identity instead
+                host = self._hosts_by_src[src]
+                pending = self._pending.get((host, request_id))
+        else:
+            # Replies without an id (e.g. -32700 parse errors) go to the
+            # oldest request still waiting on this host
+            pending = self._oldest_pending(host)
+
+        if pending is None or pending.future.done():
+            _LOGGER.debug("Ignoring late or unexpected UDP datagram from %s: %s", addr, data)
+            if pending is not None:
+                if pending.metrics is not None:
+                    pending.metrics.command(pending.method).duplicate_replies += 1
+            elif isinstance(request_id, int):
+                self._count_stray_reply(host, request_id)
+            return
+
+        _LOGGER.debug("Received UDP response from %s: %s", addr, data.decode("utf-8"))
+        if isinstance(src, str):
+            self._learn_identity(host, src)
+        if pending.metrics is not None:
+            pending.metrics.command(pending.method).record_rtt(time.monotonic() - pending.sent_at)
+        pending.future.set_result(response)
+
+    def handle_connection_lost(self, exc: Exception | None) -> None:
+        """Fail outstanding requests when the socket goes away."""
+        self._transport = None
+        self._fail_pending(exc or ConnectionError("UDP transport closed"))
+
+    def _remember_closed(
+        self,
+        host: str,
+        request_id: int,
+        pending: _PendingRequest,
+        answered: bool,
+    ) -> None:
+        """Remember a released request to classify replies arriving after it."""
+        self._closed[(host, request_id)] = (pending.metrics, pending.method, answered)
+        if len(self._closed) > CLOSED_REQUEST_MEMORY:
+            self._closed.popitem(last=False)
+
+    def _count_stray_reply(self, host: str, request_id: int) -> None:
+        """Count a reply to a released request as late or duplicate."""
+        closed = self._closed.get((host, request_id))
+        if closed is None:
+            return
+        metrics, method, answered = closed
+        if answered:
+            metrics.command(method).duplicate_replies += 1
+        else:
+            metrics.command(method).late_replies += 1
+            # Any further copy of the reply is a duplicate
+            self._closed[(host, request_id)] = (metrics, method, True)
+
+    def _learn_identity(self, host: str, src: str) -> None:
+        """Remember which battery identity answers from which host."""
+        if self._srcs_by_host.get(host) == src:
+            return
+        previous = self._srcs_by_host.get(host)
+        if previous is not None and self._hosts_by_src.get(previous) == host:
+            del self._hosts_by_src[previous]
+        self._srcs_by_host[host] = src
+        self._hosts_by_src[src] = host
+
+    def _allocate_id(self, host: str) -> int:
+        """Return a request id not currently in use for the host."""
+        while True:
+            # Keep ids positive and within a signed 32-bit range
+            self._next_id = self._next_id % 0x7FFFFFFF + 1
+            if (host, self._next_id) not in self._pending:
+                self._closed.pop((host, self._next_id), None)
+                return self._next_id
+
+    def _oldest_pending(self, host: str) -> _PendingRequest | None:
+        """Return the oldest unresolved request for the host."""
+        for (pending_host, _), pending in self._pending.items():
+            if pending_host == host and not pending.future.done():
+                return pending
+        return None
+
+    def _fail_pending(self, exc: Exception) -> None:
+        """Fail every outstanding request with the given exception."""
+        for pending in self._pending.values():
+            if not pending.future.done():
+                pending.future.set_exception(exc)
+        self._pending.clear()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Regression test for collapsed ES.SetMode writes of the Marstek Venus E 3.0 coordinator.
+
+A write collapsed into another one must still be sent when the caller
+sending it is cancelled, instead of waiting for its reply forever.
+"""
+
+import asyncio
+import tempfile
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.marstek_venus_e3.coordinator import MarstekVenusE3Coordinator
+from tools.venus_e_emulator import VenusEmulator
+
+
+async def _cancel_collapsed_write() -> tuple[bool, str]:
+    """Cancel a write that another one was collapsed into."""
+    hass = HomeAssistant(tempfile.mkdtemp())
+    async with VenusEmulator(1, base_address="127.0.4.1", port=30000) as emulator:
+        coordinator = MarstekVenusE3Coordinator(hass, "127.0.4.1", 30000)
+        await coordinator.async_connect()
+        try:
+            emulator.batteries[0].mode = "Manual"
+
+            # Hold every slot so both writes wait in the queue
+            release = asyncio.Event()
+
+            async def hold() -> None:
+                async with coordinator.queue.slot(0):
+                    await release.wait()
+
+            holders = [asyncio.create_task(hold()) for _ in range(3)]
+            while coordinator.queue._free:  # pylint: disable=protected-access
+                await asyncio.sleep(0)
+
+            first = asyncio.create_task(coordinator.async_set_mode(mode=3, power=500, cd_time=60))
+            await asyncio.sleep(0.05)
+            second = asyncio.create_task(coordinator.async_set_mode(mode=0))
+            await asyncio.sleep(0.05)
+
+            first.cancel()
+            release.set()
+            await asyncio.gather(*holders)
+
+            success = await asyncio.wait_for(second, 3)
+            return success, emulator.batteries[0].mode
+        finally:
+            await coordinator.async_disconnect()
+
+
+def test_cancelled_write_sends_collapsed_write():
+    """The collapsed caller sends its own write once the first one is cancelled."""
+    success, mode = asyncio.run(_cancel_collapsed_write())
+    assert success
+    assert mode == "Auto"
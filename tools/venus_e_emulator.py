@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""UDP JSON-RPC emulator of the Marstek Venus E 3.0 Open API.
+
+Emulates one or many batteries on a single machine so the integration can
+be load-tested and regression-tested without hardware. Every virtual
+battery listens on its own loopback address (127.0.1.1, 127.0.1.2, ...),
+which Linux accepts without any network configuration.
+
+Faults can be injected per request: extra latency, packet loss, -32700
+parse errors, duplicated replies and late replies. The firmware overload
+seen on real batteries can be modelled too: requests arriving too soon
+after the previous one get a -32700 reply. All random decisions
+come from a seeded generator so a scenario replays identically.
+
+Usage:
+    python tools/venus_e_emulator.py                      # one battery on 127.0.1.1:30000
+    python tools/venus_e_emulator.py --devices 20 --loss 0.1 --parse-error 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import ipaddress
+import json
+import logging
+import random
+import sys
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BASE_ADDRESS = "127.0.1.1"
+DEFAULT_PORT = 30000
+
+ES_MODES = ("Auto", "AI", "Manual", "Passive")
+
+ERROR_PARSE = -32700
+ERROR_METHOD_NOT_FOUND = -32601
+ERROR_INVALID_PARAMS = -32602
+
+
+class JsonRpcError(Exception):
+    """Error returned to the client as a JSON-RPC error object."""
+
+    def __init__(self, code: int, message: str) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class FaultProfile:
+    """Faults injected on every request of a virtual battery."""
+
+    latency: float = 0.0  # Base reply delay in seconds
+    jitter: float = 0.0  # Uniform extra delay in seconds
+    loss: float = 0.0  # Probability that a request gets no reply
+    parse_error: float = 0.0  # Probability of a -32700 reply
+    duplicate: float = 0.0  # Probability that the reply is sent twice
+    late: float = 0.0  # Probability that the reply is delayed by late_delay
+    late_delay: float = 3.0
+    overload_gap: float = 0.0  # Requests closer than this to the previous one get -32700
+
+
+@dataclass
+class VirtualBattery:
+    """State and Open API handlers of one emulated battery."""
+
+    src: str
+    ip: str
+    soc: int = 80
+    mode: str = "Auto"
+    load_power: int = 400  # House consumption seen by the CT meter, in W
+    pv_power: int = 0
+    bat_temp: float = 24.0
+    rated_capacity: int = 5120
+    manual_cfg: dict[int, dict[str, Any]] = field(default_factory=dict)
+    passive_power: int = 0
+    passive_until: float = 0.0
+    requests: int = 0
+
+    @property
+    def bat_power(self) -> int:
+        """Return the battery power (positive = discharge)."""
+        if self.mode == "Passive" and time.monotonic() < self.passive_until:
+            return self.passive_power
+        return 0
+
+    def handle(self, method: str, params: dict[str, Any]) -> dict[str, Any]:
+        """Return the result of a JSON-RPC call."""
+        self.requests += 1
+        handler = getattr(self, "_" + method.replace(".", "_").lower(), None)
+        if handler is None:
+            raise JsonRpcError(ERROR_METHOD_NOT_FOUND, "Method not found")
+        return handler(params)
+
+    def _marstek_getdevice(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle Marstek.GetDevice (discovery)."""
+        mac = self.src.rsplit("-", 1)[-1]
+        return {
+            "device": self.src.rsplit("-", 1)[0],
+            "ver": 154,
+            "ble_mac": mac,
+            "wifi_mac": mac,
+            "wifi_name": "emulator",
+            "ip": self.ip,
+        }
+
+    def _es_getmode(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle ES.GetMode."""
+        meter = self._em_getstatus(params)
+        return {
+            "id": 0,
+            "mode": self.mode,
+            "ongrid_power": self.bat_power,
+            "offgrid_power": 0,
+            "bat_soc": self.soc,
+            "ct_state": meter["ct_state"],
+            "a_power": meter["a_power"],
+            "b_power": meter["b_power"],
+            "c_power": meter["c_power"],
+            "total_power": meter["total_power"],
+            "input_energy": 0,
+            "output_energy": 0,
+        }
+
+    def _es_getstatus(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle ES.GetStatus."""
+        return {
+            "id": 0,
+            "bat_soc": self.soc,
+            "bat_cap": self.rated_capacity,
+            "pv_power": self.pv_power,
+            "ongrid_power": self.bat_power,
+            "offgrid_power": 0,
+            "bat_power": self.bat_power,
+        }
+
+    def _bat_getstatus(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle Bat.GetStatus."""
+        return {
+            "id": 0,
+            "soc": self.soc,
+            "charg_flag": self.soc < 100,
+            "dischrg_flag": self.soc > 0,
+            "bat_temp": self.bat_temp,
+            "bat_capacity": self.rated_capacity * self.soc // 100,
+            "rated_capacity": self.rated_capacity,
+        }
+
+    def _pv_getstatus(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle PV.GetStatus."""
+        return {"id": 0, "pv_power": self.pv_power, "pv_voltage": 0, "pv_current": 0}
+
+    def _em_getstatus(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle EM.GetStatus (grid import is positive)."""
+        grid = self.load_power - self.pv_power - self.bat_power
+        return {
+            "id": 0,
+            "ct_state": 1,
+            "a_power": grid // 3,
+            "b_power": grid // 3,
+            "c_power": grid - 2 * (grid // 3),
+            "total_power": grid,
+        }
+
+    def _es_setmode(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Handle ES.SetMode."""
+        config = params.get("config")
+        if config is None:
+            # Short form used for Auto and AI: {"id": 0, "mode": 0}
+            mode = params.get("mode")
+            if not isinstance(mode, int) or not 0 <= mode < len(ES_MODES):
+                raise JsonRpcError(ERROR_INVALID_PARAMS, "Invalid params")
+            self.mode = ES_MODES[mode]
+            return {"id": 0, "set_result": True}
+
+        mode = config.get("mode")
+        if mode not in ES_MODES:
+            raise JsonRpcError(ERROR_INVALID_PARAMS, "Invalid params")
+
+        if mode == "Manual":
+            cfg = config.get("manual_cfg") or {}
+            time_num = cfg.get("time_num")
+            if not isinstance(time_num, int) or not 0 <= time_num <= 9:
+                raise JsonRpcError(ERROR_INVALID_PARAMS, "Invalid params")
+            self.manual_cfg[time_num] = dict(cfg)
+        elif mode == "Passive":
+            cfg = config.get("passive_cfg") or {}
+            self.passive_power = int(cfg.get("power", 0))
+            self.passive_until = time.monotonic() + int(cfg.get("cd_time", 0))
+
+        self.mode = mode
+        return {"id": 0, "set_result": True}
+
+
+class VirtualBatteryProtocol(asyncio.DatagramProtocol):
+    """Datagram endpoint of one virtual battery applying the fault profile."""
+
+    def __init__(
+        self,
+        battery: VirtualBattery,
+        faults: FaultProfile,
+        rng: random.Random,
+    ) -> None:
+        """Initialize the endpoint."""
+        self.battery = battery
+        self.faults = faults
+        self._rng = rng
+        self._transport: asyncio.DatagramTransport | None = None
+        self._last_request = float("-inf")
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Store the transport."""
+        self._transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        """Answer a request, possibly injecting a fault."""
+        faults = self.faults
+        rng = self._rng
+
+        if rng.random() < faults.loss:
+            _LOGGER.debug("%s: dropping request from %s", self.battery.src, addr)
+            return
+
+        now = time.monotonic()
+        overloaded = now - self._last_request < faults.overload_gap
+        self._last_request = now
+
+        if overloaded or rng.random() < faults.parse_error:
+            reply = {"id": None, "src": self.battery.src, "error": {"code": ERROR_PARSE, "message": "Parse error"}}
+        else:
+            reply = self._reply(data)
+
+        delay = faults.latency + rng.random() * faults.jitter
+        if rng.random() < faults.late:
+            delay += faults.late_delay
+        copies = 2 if rng.random() < faults.duplicate else 1
+
+        message = json.dumps(reply, separators=(",", ":")).encode("utf-8")
+        loop = asyncio.get_running_loop()
+        for _ in range(copies):
+            if delay > 0:
+                loop.call_later(delay, self._send, message, addr)
+            else:
+                self._send(message, addr)
+
+    def _reply(self, data: bytes) -> dict[str, Any]:
+        """Build the JSON-RPC reply of a request."""
+        try:
+            request = json.loads(data.decode("utf-8"))
+            request_id = request["id"]
+            method = request["method"]
+            params = request.get("params") or {}
+        except (UnicodeDecodeError, ValueError, KeyError, TypeError):
+            return {"id": None, "src": self.battery.src, "error": {"code": ERROR_PARSE, "message": "Parse error"}}
+
+        try:
+            result = self.battery.handle(method, params)
+        except JsonRpcError as err:
+            return {"id": request_id, "src": self.battery.src, "error": {"code": err.code, "message": err.message}}
+        return {"id": request_id, "src": self.battery.src, "result": result}
+
+    def _send(self, message: bytes, addr: tuple[str, int]) -> None:
+        """Send a reply if the endpoint is still open."""
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.sendto(message, addr)
+
+
+class VenusEmulator:
+    """A set of virtual batteries running on the local machine."""
+
+    def __init__(
+        self,
+        count: int = 1,
+        base_address: str = DEFAULT_BASE_ADDRESS,
+        port: int = DEFAULT_PORT,
+        faults: FaultProfile | None = None,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the emulator."""
+        self.port = port
+        self.faults = faults or FaultProfile()
+        first = ipaddress.IPv4Address(base_address)
+        self.batteries = [
+            VirtualBattery(src=f"VenusE 3.0-{index:012x}", ip=str(first + index))
+            for index in range(count)
+        ]
+        self._seed = seed
+        self._transports: list[asyncio.DatagramTransport] = []
+
+    @property
+    def addresses(self) -> list[str]:
+        """Return the addresses of the virtual batteries."""
+        return [battery.ip for battery in self.batteries]
+
+    async def async_start(self) -> None:
+        """Open one endpoint per virtual battery."""
+        loop = asyncio.get_running_loop()
+        for index, battery in enumerate(self.batteries):
+            rng = random.Random(self._seed + index)
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda battery=battery, rng=rng: VirtualBatteryProtocol(battery, self.faults, rng),
+                local_addr=(battery.ip, self.port),
+            )
+            self._transports.append(transport)
+
+    def close(self) -> None:
+        """Close every endpoint."""
+        for transport in self._transports:
+            transport.close()
+        self._transports.clear()
+
+    async def __aenter__(self) -> VenusEmulator:
+        """Start the emulator."""
+        await self.async_start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Stop the emulator."""
+        self.close()
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    """Run the emulator until interrupted."""
+    faults = FaultProfile(
+        latency=args.latency,
+        jitter=args.jitter,
+        loss=args.loss,
+        parse_error=args.parse_error,
+        duplicate=args.duplicate,
+        late=args.late,
+        late_delay=args.late_delay,
+        overload_gap=args.overload_gap,
+    )
+    async with VenusEmulator(args.devices, args.base_address, args.port, faults, args.seed) as emulator:
+        for battery in emulator.batteries:
+            print(f"{battery.src} listening on {battery.ip}:{args.port}", flush=True)
+        await asyncio.Event().wait()
+
+
+def main() -> int:
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--base-address", default=DEFAULT_BASE_ADDRESS)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="reply delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra delay in seconds")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of dropping a request")
+    parser.add_argument("--parse-error", type=float, default=0.0, help="probability of a -32700 reply")
+    parser.add_argument("--duplicate", type=float, default=0.0, help="probability of a duplicated reply")
+    parser.add_argument("--late", type=float, default=0.0, help="probability of a late reply")
+    parser.add_argument("--late-delay", type=float, default=3.0, help="delay of late replies in seconds")
+    parser.add_argument(
+        "--overload-gap",
+        type=float,
+        default=0.0,
+        help="answer -32700 to requests arriving less than this many seconds after the previous one",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())